@@ -2,18 +2,60 @@
 Entry point definitions
 """
 import os
+import socket
 import subprocess
 import sys
+import tempfile
 import threading
 import time
-import requests
-from requests.exceptions import (
-    ConnectionError as RequestConnectionError,
-    Timeout,
-    RequestException
-)
 
-from .proto_explore_searcher import parse_args
+from .proto_loader import parse_args, resolve_module_args
+from .proto_profile import StartupProfile
+
+# Subcommands that run without Streamlit. Their modules are imported on
+# demand so that none of them (nor the app) pays for the others' imports.
+SUBCOMMANDS = ("tree", "search", "stats", "export-html", "compile", "compile-server")
+
+
+def run_subcommand(command: str, argv: list[str]):
+    """
+    Run one of the headless SUBCOMMANDS.
+    """
+    if command == "export-html":
+        from .proto_export import main as export_html_main
+        export_html_main(argv)
+    elif command == "compile":
+        from .proto_compiler import main as compile_main
+        compile_main(argv)
+    elif command == "compile-server":
+        from .proto_server import main as server_main
+        server_main(argv)
+    else:
+        from .proto_commands import main as command_main
+        command_main(command, argv)
+
+
+def free_port() -> int:
+    """Return a TCP port that is currently free on localhost."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(port: int, proc: subprocess.Popen, timeout: float = 30.0) -> bool:
+    """
+    Wait until something accepts TCP connections on localhost:port.
+
+    Returns False on timeout, or as soon as proc exits.
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline and proc.poll() is None:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.1):
+                return True
+        except OSError:
+            time.sleep(0.02)
+    return False
 
 
 def cli_entry_point():
@@ -22,19 +64,82 @@ def cli_entry_point():
     and passes all custom arguments. This is the console script entry point
     registered by Poetry.
     """
+    if sys.argv[1:2] and sys.argv[1] in SUBCOMMANDS:
+        run_subcommand(sys.argv[1], sys.argv[2:])
+        return
 
+    # Phases are timed regardless; they are only reported with --profile-startup
+    profile = StartupProfile()
     try:
-        args = parse_args()
+        with profile.phase("argument parsing"):
+            args = parse_args(resolve=False)
+        # Looks up and imports the _pb2 module, if one was given
+        with profile.phase("module import", module=args.proto_module):
+            args = resolve_module_args(args)
     except ValueError as e:
         print(f"Argument error: {e}", file=sys.stderr)
         sys.exit(1)
 
+    # Files handed to the app, removed when it exits
+    tmp_dir = tempfile.TemporaryDirectory(prefix="protoexplorer_")
+
+    # .proto sources are compiled into a descriptor set (cached when
+    # possible) which the app then loads like any other
+    if args.proto_paths:
+        from .proto_cache import cache_dir
+        from .proto_compiler import descriptor_set_file
+        out_path = None
+        if cache_dir() is None:
+            out_path = os.path.join(tmp_dir.name, "schema.pb")
+        try:
+            with profile.phase("proto compile", files=len(args.proto_paths)):
+                set_path, args.root_file = descriptor_set_file(args.proto_paths, out_path)
+                args.descriptor_set = str(set_path)
+        except (FileNotFoundError, RuntimeError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+
+    # Build the schema here, where the module is already imported, and hand
+    # it to the app as a snapshot: the app then neither imports the module
+    # nor walks descriptors, and the first session is as fast as later ones
+    # (catalog schemas are loaded lazily by the app instead)
+    snapshot = None
+    if not args.catalog:
+        from .proto_cache import cache_dir, write_snapshot
+        from .proto_schema import load_schema
+        snapshot = os.path.join(tmp_dir.name, "schema.bin")
+        try:
+            with profile.phase("descriptor indexing", cache=cache_dir() is not None) as detail:
+                schema = load_schema(
+                    args.proto_module, args.load_path, args.descriptor_set,
+                    root_files=args.root_file,
+                )
+                detail["messages"] = len(schema[0])
+        except (ValueError, ImportError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        with profile.phase("snapshot write"):
+            if not write_snapshot(snapshot, *schema):
+                snapshot = None
+
+    if args.profile_startup:
+        from .proto_profile import import_time_tree
+        # Measured in a fresh interpreter, where nothing is imported yet
+        modules = ["streamlit", "google.protobuf"]
+        if args.proto_module:
+            modules.append(args.proto_module)
+        profile.import_tree = import_time_tree(modules, args.load_path)
+
     # 1. Find the absolute path to app.py relative to this file
     # This ensures the script is found reliably after installation.
     current_dir = os.path.dirname(__file__)
-    app_path = os.path.join(current_dir, "proto_explore_searcher.py")
+    app_path = os.path.join(current_dir, "streamlit_app.py")
 
-    # 2. Build the command:
+    # 2. Pick the port up front, so several instances can run side by side
+    # and readiness can be checked on the right port
+    port = args.port or free_port()
+
+    # 3. Build the command:
     # ['python', '-m', 'streamlit', 'run', '/path/to/app.py',
     # '--', '--load_path=...', ...]
     command = [
@@ -47,34 +152,56 @@ def cli_entry_point():
         "true",
         "--logger.level",
         "error",
+        "--server.port",
+        str(port),
         # '--server.address', 'localhost',
         "--",
-        f"--proto_module={args.proto_module}",
     ]
+    if args.catalog:
+        command += ["--catalog", *args.catalog]
+        if args.max_memory_mb:
+            command.append(f"--max-memory-mb={args.max_memory_mb}")
+    elif args.descriptor_set:
+        command.append(f"--descriptor_set={args.descriptor_set}")
+        command += [f"--root_file={name}" for name in args.root_file or ()]
+    else:
+        command.append(f"--proto_module={args.proto_module}")
     if args.load_path:
         command.append(f"--load_path={args.load_path}")
+    if snapshot:
+        command.append(f"--snapshot={snapshot}")
+    profile_out = None
+    if args.profile_startup:
+        profile_out = os.path.join(tmp_dir.name, "profile.json")
+        command.append(f"--profile-out={profile_out}")
 
     print("Launching Proto Explorer...")
-    # Start Streamlit server
-    proc = subprocess.Popen(command)
+    with profile.phase("streamlit readiness wait", port=port) as detail:
+        # Start Streamlit server
+        proc = subprocess.Popen(command)
+        # Wait until Streamlit is up before printing the URL and quit instructions
+        ready = detail["ready"] = wait_for_port(port, proc)
 
-    def wait_for_streamlit():
-        for _ in range(20):  # timeout of (0.25 + 0.1) * 20 = 7 seconds
-            try:
-                requests.get("http://localhost:8501", timeout=0.25)
-                return True
-            except (RequestConnectionError, Timeout, RequestException):
-                time.sleep(0.1)
-        return False
+    report_profile = None
+    if args.profile_startup:
+        report_profile = _profile_reporter(profile, profile_out, proc, args.profile_json)
 
-    # Wait until Streamlit is up before printing quit instructions
-    if wait_for_streamlit():
+    if ready:
         color_yellow = "\033[93m"
         color_reset = "\033[0m"
+        print(f"\nProto Explorer is running at http://localhost:{port}")
         print(f"\n{color_yellow}Press 'q' then Enter to quit Proto Explorer.")
         print(f"{color_reset}\n")
+        if report_profile:
+            print("Open the app to record its first render in the startup profile.\n")
+    elif proc.poll() is not None:
+        print("\n(Error) Streamlit exited during startup.\n", file=sys.stderr)
+        if report_profile:
+            report_profile("Streamlit exited during startup")
+        tmp_dir.cleanup()
+        sys.exit(proc.returncode or 1)
     else:
-        print("\n(Warning) Streamlit may not have started yet.\n")
+        print(f"\n(Warning) Streamlit is not accepting connections on port {port} yet.\n")
 
     # Watcher thread for user Quit
     def quit_watcher():
@@ -92,3 +219,44 @@ def cli_entry_point():
         proc.wait()
     except KeyboardInterrupt:
         proc.terminate()
+    finally:
+        proc.wait()
+        if report_profile:
+            report_profile()
+        tmp_dir.cleanup()
+
+
+def _profile_reporter(profile, profile_out, proc, json_path):
+    """
+    Start a thread that reports the startup profile once the app has
+    written its phases (after its first render).
+
+    Returns a function reporting it right away instead, for when the app
+    exits first, taking the reason the app phases are missing; the report
+    is printed only once either way.
+    """
+    from .proto_profile import read_phases, report
+
+    lock = threading.Lock()
+    done = []
+
+    def report_once(missing: str = "the app was never opened"):
+        with lock:
+            if done:
+                return
+            done.append(True)
+            app_phases = read_phases(profile_out) or []
+            profile.phases.extend(app_phases)
+            if not app_phases:
+                print(f"(No first render recorded: {missing}.)", file=sys.stderr)
+            report(profile, json_path)
+
+    def wait_for_app():
+        while proc.poll() is None and not done:
+            if os.path.exists(profile_out):
+                report_once()
+                return
+            time.sleep(0.1)
+
+    threading.Thread(target=wait_for_app, daemon=True).start()
+    return report_once
@@ -0,0 +1,245 @@
+"""
+Module for the persistent on-disk cache of built schema row models.
+
+Layout under the cache directory:
+  files/<sha256>.bin    Rows of the messages declared in one .proto file,
+                        keyed by the hash of its serialized FileDescriptorProto.
+  sources/<sha256>.bin  Manifest of one schema source (a _pb2 module or a
+                        descriptor set): the (path, mtime, size) stamps of its
+                        inputs, its message names and the file entries it uses.
+
+Entries are marshal-encoded tuples of plain values, which load straight
+from an mmap in milliseconds. When every stamp of a manifest still matches,
+the schema is served from the cache without importing any generated code.
+Otherwise the source is loaded again and only the files whose descriptors
+changed are rebuilt.
+"""
+import hashlib
+import marshal
+import mmap
+import os
+import sys
+import tempfile
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+from .proto_index import SchemaIndex, index_descriptor_set, index_module, iter_messages
+from .proto_loader import import_proto_module
+from .proto_schema import FieldRow, RowModel, message_rows
+
+# Bump when the entry layout or the meaning of FieldRow changes
+_FORMAT = 1
+
+# (path, mtime_ns, size)
+Stamp = Tuple[str, int, int]
+
+
+def cache_dir() -> Optional[Path]:
+    """
+    Root of the schema cache, or None if caching is disabled.
+
+    Honors PROTO_EXPLORER_NO_CACHE=1 and PROTO_EXPLORER_CACHE_DIR, then
+    XDG_CACHE_HOME, defaulting to ~/.cache/proto-explorer.
+    """
+    if os.environ.get("PROTO_EXPLORER_NO_CACHE"):
+        return None
+    if os.environ.get("PROTO_EXPLORER_CACHE_DIR"):
+        return Path(os.environ["PROTO_EXPLORER_CACHE_DIR"])
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return Path(base) / "proto-explorer"
+
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _stamp(path: str) -> Optional[Stamp]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (path, st.st_mtime_ns, st.st_size)
+
+
+def _read(path: Path):
+    """Unmarshal a cache file through an mmap; None if missing or corrupt."""
+    try:
+        with open(path, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                value = marshal.loads(data)
+    except (OSError, ValueError, EOFError, TypeError):
+        return None
+    if not isinstance(value, tuple) or not value or value[0] != _FORMAT:
+        return None
+    return value
+
+
+def _write(path: Path, value: tuple):
+    """Atomically write a marshal-encoded cache file; failures are ignored."""
+    tmp = None
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            marshal.dump(value, f)
+        os.replace(tmp, path)
+    except OSError:
+        if tmp:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+
+
+def _reachable(roots: Iterable[str], rows: RowModel) -> RowModel:
+    """Restrict a row model to the messages reachable from roots."""
+    model: RowModel = {}
+    stack = [name for name in roots if name in rows]
+    while stack:
+        name = stack.pop()
+        if name in model:
+            continue
+        model[name] = rows[name]
+        stack.extend(row.child for row in rows[name] if row.child and row.child in rows)
+    return model
+
+
+def _load_entries(root: Path, keys: Iterable[str]) -> Optional[RowModel]:
+    rows: RowModel = {}
+    for key in keys:
+        entry = _read(root / "files" / f"{key}.bin")
+        if entry is None:
+            return None
+        for name, field_rows in entry[1]:
+            rows[name] = tuple(FieldRow(*row) for row in field_rows)
+    return rows
+
+
+def _build_entries(root: Path, index: SchemaIndex) -> Tuple[List[str], RowModel]:
+    """
+    Return the entry keys and rows of every file in the index, reusing the
+    cached entry of each file whose descriptor did not change.
+    """
+    keys = []
+    rows: RowModel = {}
+    for file_desc in index.files.values():
+        key = _sha256(file_desc.serialized_pb)
+        keys.append(key)
+        cached = _load_entries(root, [key])
+        if cached is not None:
+            rows.update(cached)
+            continue
+        file_rows = {
+            msg.full_name: message_rows(msg)
+            for msg in iter_messages(file_desc)
+            if not msg.GetOptions().map_entry
+        }
+        rows.update(file_rows)
+        _write(
+            root / "files" / f"{key}.bin",
+            (_FORMAT, tuple((name, tuple(tuple(r) for r in field_rows))
+                            for name, field_rows in file_rows.items())),
+        )
+    return keys, rows
+
+
+def _module_stamps(module, index: SchemaIndex) -> List[Stamp]:
+    """
+    Stamps of the generated _pb2.py files behind an imported module: the
+    module itself first, then the modules of its imports when they follow
+    the usual path-to-module naming.
+    """
+    paths = [module.__file__]
+    for name in index.files:
+        module_name = name[:-len(".proto")].replace("/", ".") + "_pb2"
+        paths.append(getattr(sys.modules.get(module_name), "__file__", None))
+    stamps = {}
+    for path in filter(None, paths):
+        stamp = _stamp(os.path.abspath(path))
+        if stamp:
+            stamps.setdefault(stamp[0], stamp)
+    return list(stamps.values())
+
+
+def write_snapshot(path: str | Path, roots: List[str], rows: RowModel) -> bool:
+    """
+    Write a whole schema (message names and row model) to one file that
+    read_snapshot loads without importing or indexing anything. Returns
+    False if it could not be written.
+    """
+    path = Path(path)
+    _write(path, (_FORMAT, tuple(roots), tuple(
+        (name, tuple(tuple(row) for row in field_rows)) for name, field_rows in rows.items()
+    )))
+    return path.is_file()
+
+
+def read_snapshot(path: str | Path) -> Optional[Tuple[List[str], RowModel]]:
+    """Load a write_snapshot file; None if missing or unreadable."""
+    value = _read(Path(path))
+    if value is None or len(value) != 3:
+        return None
+    rows = {
+        name: tuple(FieldRow(*row) for row in field_rows)
+        for name, field_rows in value[2]
+    }
+    return list(value[1]), rows
+
+
+def cached_schema(
+        proto_module: Optional[str] = None,
+        load_path: Optional[str] = None,
+        descriptor_set: Optional[str] = None,
+        cache_index: bool = True,
+        root_files: Optional[Iterable[str]] = None,
+) -> Optional[Tuple[List[str], RowModel]]:
+    """
+    Load a schema through the on-disk cache.
+
+    cache_index and root_files are passed on to the proto_index functions
+    on a cache miss.
+
+    Returns:
+        (sorted message names, row model), or None if caching is disabled
+        or the source has no file DESCRIPTOR to key the cache on.
+    """
+    root = cache_dir()
+    if root is None:
+        return None
+
+    if descriptor_set:
+        source_key = "set:" + os.path.abspath(descriptor_set)
+        if root_files:
+            source_key += ":" + ",".join(root_files)
+    else:
+        source_key = f"module:{proto_module}:{os.path.abspath(load_path or '.')}"
+    manifest_path = root / "sources" / f"{_sha256(source_key.encode())}.bin"
+
+    # Fast path: every input is unchanged, nothing is imported or parsed
+    manifest = _read(manifest_path)
+    if manifest is not None and manifest[1] == source_key and all(
+        _stamp(path) == (path, mtime, size) for path, mtime, size in manifest[2]
+    ):
+        rows = _load_entries(root, manifest[4])
+        if rows is not None:
+            roots = list(manifest[3])
+            return roots, _reachable(roots, rows)
+
+    if descriptor_set:
+        index = index_descriptor_set(descriptor_set, cache_index, root_files)
+        stamps = [_stamp(os.path.abspath(descriptor_set))]
+        roots = sorted(index.local_messages)
+    else:
+        module = import_proto_module(proto_module, load_path)
+        if not getattr(module, "__file__", None):
+            return None
+        try:
+            index = index_module(module, cache_index)
+        except AttributeError:
+            return None
+        stamps = _module_stamps(module, index)
+        roots = sorted(index.local_messages)
+
+    keys, rows = _build_entries(root, index)
+    _write(manifest_path, (_FORMAT, source_key, tuple(stamps), tuple(roots), tuple(keys)))
+    return roots, _reachable(roots, rows)
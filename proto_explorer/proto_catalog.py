@@ -0,0 +1,189 @@
+"""
+Module for serving many schemas from one app process: discovering the
+schema sources of a catalog and keeping the loaded ones in a bounded,
+memory-aware LRU. Must not import Streamlit.
+"""
+import os
+import sys
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from .proto_loader import import_proto_module
+from .proto_schema import RowModel, load_schema
+
+# File suffixes recognized as serialized FileDescriptorSets
+DESCRIPTOR_SET_SUFFIXES = (".pb", ".binpb", ".desc", ".protoset")
+
+
+class SchemaSource(NamedTuple):
+    """Where one catalog schema is loaded from: a _pb2 module or a descriptor set."""
+    proto_module: Optional[str]
+    load_path: Optional[str]
+    descriptor_set: Optional[str]
+    # Module found in a catalog directory, which must be loaded from there
+    in_directory: bool = False
+
+
+def _add(sources: Dict[str, SchemaSource], label: str, source: SchemaSource):
+    if source in sources.values():
+        return
+    unique, n = label, 2
+    while unique in sources:
+        unique, n = f"{label} ({n})", n + 1
+    sources[unique] = source
+
+
+def discover_sources(
+        entries: Iterable[str],
+        load_path: Optional[str] = None,
+) -> Dict[str, SchemaSource]:
+    """
+    Expand catalog entries into labelled schema sources.
+
+    Each entry is a descriptor set file, a directory, or a _pb2 module name
+    importable from load_path. Directories are searched recursively for
+    descriptor sets and for _pb2.py files, which are loaded as modules with
+    the directory as their load path.
+
+    Returns:
+        Label -> source, in discovery order.
+    """
+    sources: Dict[str, SchemaSource] = {}
+    for entry in entries:
+        path = Path(entry)
+        if path.is_dir():
+            root = path.resolve()
+            for f in sorted(root.rglob("*")):
+                rel = f.relative_to(root)
+                if f.suffix in DESCRIPTOR_SET_SUFFIXES and f.is_file():
+                    _add(sources, rel.as_posix(), SchemaSource(None, None, str(f)))
+                elif f.name.endswith("_pb2.py"):
+                    module = ".".join(rel.with_suffix("").parts)
+                    _add(sources, module, SchemaSource(module, str(root), None, True))
+        elif path.suffix in DESCRIPTOR_SET_SUFFIXES and path.is_file():
+            _add(sources, path.name, SchemaSource(None, None, str(path.resolve())))
+        else:
+            _add(sources, entry, SchemaSource(entry, load_path, None))
+    return sources
+
+
+def load_source(source: SchemaSource) -> Tuple[List[str], RowModel]:
+    """
+    load_schema for a catalog source, keeping nothing in the in-process
+    index caches so that a schema dropped by SchemaLRU can be freed.
+
+    Raises:
+        ImportError if a module found in a catalog directory resolves to a
+        file outside it (module names given as entries may come from
+        anywhere on sys.path, as with --load_path), e.g. because another directory's module of the
+        same name (say api_pb2) was loaded first: generated modules share
+        one descriptor pool, so both cannot be served.
+        ValueError if a descriptor set cannot be loaded.
+    """
+    if source.in_directory:
+        module = import_proto_module(source.proto_module, source.load_path)
+        module_file = getattr(module, "__file__", None)
+        root = os.path.realpath(source.load_path)
+        if module_file and os.path.commonpath(
+                [root, os.path.realpath(module_file)]) != root:
+            raise ImportError(
+                f"Module '{source.proto_module}' resolves to '{module_file}', "
+                f"outside '{source.load_path}'; another catalog source may "
+                f"have a module of the same name."
+            )
+    return load_schema(
+        source.proto_module, source.load_path, source.descriptor_set, cache_index=False
+    )
+
+
+def deep_size(obj: Any) -> int:
+    """
+    Approximate the memory held by nested tuples, lists, dicts, sets and
+    scalars; objects reachable twice are counted once.
+    """
+    seen = set()
+    total = 0
+    stack = [obj]
+    while stack:
+        current = stack.pop()
+        if id(current) in seen:
+            continue
+        seen.add(id(current))
+        total += sys.getsizeof(current)
+        if isinstance(current, dict):
+            stack.extend(current.keys())
+            stack.extend(current.values())
+        elif isinstance(current, (tuple, list, set, frozenset)):
+            stack.extend(current)
+    return total
+
+
+class SchemaLRU:
+    """
+    Thread-safe LRU of loaded schemas bounded by their estimated size.
+
+    Schemas are loaded on first access. When the estimated total exceeds
+    max_bytes, the least recently used ones are dropped (the one just
+    loaded is always kept). Dropping a schema only releases the LRU's own
+    reference, so load must not keep one elsewhere (load_source does not). A module-based schema's module also stays
+    in sys.modules.
+
+    Args:
+        load: Loads the schema for a key.
+        max_bytes: Memory budget for the loaded schemas.
+        size: Estimates the memory of a loaded schema.
+    """
+
+    def __init__(
+            self,
+            load: Callable[[str], Any],
+            max_bytes: int,
+            size: Callable[[Any], int] = deep_size,
+    ):
+        self._load = load
+        self._size = size
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, tuple[Any, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks: Dict[str, threading.Lock] = {}
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(size for _, size in self._entries.values())
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def get(self, key: str) -> Any:
+        """Return the schema for key, loading it if needed."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key][0]
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        # Load outside the main lock so other schemas stay available; the
+        # per-key lock keeps concurrent sessions from loading the same one
+        with key_lock:
+            with self._lock:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    return self._entries[key][0]
+            value = self._load(key)
+            size = self._size(value)
+            with self._lock:
+                self._entries[key] = (value, size)
+                total = self.total_bytes
+                while total > self.max_bytes and len(self._entries) > 1:
+                    _, (_, evicted) = self._entries.popitem(last=False)
+                    total -= evicted
+        return value
+
+
+def memory_budget(megabytes: Optional[float]) -> int:
+    """Bytes for a --max-memory-mb value; None means PROTO_EXPLORER_MAX_MEMORY_MB or 512."""
+    if megabytes is None:
+        megabytes = float(os.environ.get("PROTO_EXPLORER_MAX_MEMORY_MB", 512))
+    return int(megabytes * 1024 * 1024)
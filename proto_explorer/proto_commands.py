@@ -0,0 +1,165 @@
+"""
+Headless terminal subcommands: `tree`, `search` and `stats`.
+
+These print to stdout and never import Streamlit, so they start quickly and
+work in scripts and over SSH.
+"""
+import argparse
+import re
+import sys
+from re import Pattern
+from typing import Iterator, List, Optional, TextIO
+
+from .proto_index import index_descriptor_set, index_module
+from .proto_loader import add_module_args, import_proto_module, resolve_module_args
+from .proto_schema import RowModel, load_schema
+from .proto_search import build_match_index, message_graph
+
+_COLOR_YELLOW = "\033[93m"
+_COLOR_RESET = "\033[0m"
+
+
+def _highlight(text: str, regex: Optional[Pattern], color: bool) -> str:
+    if not (regex and color):
+        return text
+    return regex.sub(lambda m: f"{_COLOR_YELLOW}{m.group()}{_COLOR_RESET}", text)
+
+
+def _tree_lines(message, rows, depth, shown, max_depth) -> Iterator[str]:
+    for row in rows.get(message, ()):
+        line = "  " * depth + f"- {row.text}"
+        if row.child and (
+            row.child in shown or (max_depth is not None and depth >= max_depth)
+        ):
+            yield line + " ↪"
+            continue
+        yield line
+        if row.child:
+            shown.add(row.child)
+            yield from _tree_lines(row.child, rows, depth + 1, shown, max_depth)
+
+
+def tree_lines(
+        roots: List[str],
+        rows: RowModel,
+        max_depth: Optional[int] = None,
+) -> Iterator[str]:
+    """
+    Yield the indented hierarchy under each root, one line per field.
+
+    Like the app, each message is expanded once per root; later references
+    (and messages past max_depth) are marked with ↪ instead of repeated.
+    """
+    for root in roots:
+        yield root
+        yield from _tree_lines(root, rows, 1, {root}, max_depth)
+
+
+def search_lines(
+        roots: List[str],
+        rows: RowModel,
+        regex: Pattern,
+        color: bool = False,
+) -> Iterator[str]:
+    """
+    Yield every message with a match on itself or one of its fields,
+    followed by its matching field lines.
+    """
+    matches = build_match_index(message_graph(rows), regex)
+    ordered = [name for name in roots if name in rows]
+    ordered += sorted(set(rows) - set(ordered))
+    for full_name in ordered:
+        if full_name not in matches:
+            continue
+        hits = [row for row in rows[full_name] if regex.search(f"- {row.text}")]
+        if not (hits or regex.search(full_name)):
+            continue
+        yield _highlight(full_name, regex, color)
+        for row in hits:
+            yield "  " + _highlight(f"- {row.text}", regex, color)
+
+
+def schema_stats(roots: List[str], rows: RowModel) -> dict:
+    """Count messages and fields of a row model."""
+    field_rows = [row for message_rows in rows.values() for row in message_rows]
+    oneofs = {
+        (name, row.oneof)
+        for name, message_rows in rows.items()
+        for row in message_rows if row.oneof
+    }
+    return {
+        "top_level_messages": len(roots),
+        "reachable_messages": len(rows),
+        "fields": len(field_rows),
+        "message_fields": sum(1 for row in field_rows if row.child),
+        "map_fields": sum(1 for row in field_rows if row.is_map),
+        "repeated_fields": sum(1 for row in field_rows if row.is_repeated and not row.is_map),
+        "oneof_groups": len(oneofs),
+    }
+
+
+def _write_lines(lines, out: TextIO):
+    try:
+        for line in lines:
+            out.write(line + "\n")
+    except BrokenPipeError:
+        # e.g. `proto-explorer tree ... | head`
+        sys.stderr.close()
+
+
+def main(command: str, argv: list[str] | None = None):
+    """
+    Entry point of the `tree`, `search` and `stats` subcommands.
+    """
+    parser = argparse.ArgumentParser(prog=f"proto-explorer {command}")
+    add_module_args(parser)
+    if command == "tree":
+        parser.description = "Print the message hierarchy."
+        parser.add_argument(
+            "--message", help="Only print the tree under this message full name."
+        )
+        parser.add_argument("--max-depth", type=int, help="Limit nesting depth.")
+    elif command == "search":
+        parser.description = "Print messages and fields matching a regex."
+        parser.add_argument("regex", help="Regular expression to search for.")
+    else:
+        parser.description = "Print message and field counts."
+    args = parser.parse_args(argv)
+
+    try:
+        resolve_module_args(args)
+        roots, rows = load_schema(args.proto_module, args.load_path, args.descriptor_set)
+    except (ValueError, ImportError) as e:
+        print(f"Argument error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    if command == "tree":
+        if args.message:
+            if args.message not in rows:
+                print(f"Unknown message: {args.message}", file=sys.stderr)
+                sys.exit(1)
+            roots = [args.message]
+        _write_lines(tree_lines(roots, rows, args.max_depth), sys.stdout)
+    elif command == "search":
+        try:
+            regex = re.compile(args.regex)
+        except re.error as e:
+            print(f"Invalid regex: {e}", file=sys.stderr)
+            sys.exit(1)
+        _write_lines(search_lines(roots, rows, regex, sys.stdout.isatty()), sys.stdout)
+    else:
+        stats = schema_stats(roots, rows)
+        try:
+            if args.descriptor_set:
+                index = index_descriptor_set(args.descriptor_set)
+            else:
+                index = index_module(import_proto_module(args.proto_module, args.load_path))
+            stats.update(
+                files=len(index.files),
+                enums=len(index.enums),
+                services=len(index.services),
+            )
+        except AttributeError:
+            pass
+        for key, value in stats.items():
+            print(f"{key}: {value}")
@@ -0,0 +1,165 @@
+"""
+Module for the content-addressed cache of protoc outputs.
+
+A .proto file's generated _pb2.py/_pb2_grpc.py only depend on the file, its
+transitive imports, the include paths used to resolve them and the protoc
+version. Hashing those gives a key under which the outputs are stored once
+and hard-linked (or copied) back into place on later compiles.
+"""
+import functools
+import hashlib
+import importlib.metadata
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+from .proto_cache import cache_dir
+from .proto_finder import _extract_imports
+
+
+@functools.lru_cache(maxsize=None)
+def protoc_version() -> str:
+    """Version of the bundled protoc, i.e. of grpcio-tools."""
+    try:
+        return importlib.metadata.version("grpcio-tools")
+    except importlib.metadata.PackageNotFoundError:
+        return "unknown"
+
+
+def output_names(proto_file: Path, proto_root: Path) -> List[Path]:
+    """
+    Paths, relative to the output directory, of the files protoc generates
+    for proto_file (e.g. a/b/c.proto -> a/b/c_pb2.py, a/b/c_pb2_grpc.py).
+    """
+    stem = proto_file.relative_to(proto_root).with_suffix("")
+    return [
+        stem.with_name(stem.name + "_pb2.py"),
+        stem.with_name(stem.name + "_pb2_grpc.py"),
+    ]
+
+
+class CompileCache:
+    """
+    Content-addressed store of generated files.
+
+    File digests and import lists are memoized per instance, so computing
+    keys for every file of a tree reads each file once.
+
+    Args:
+        root: Cache directory; defaults to <cache_dir()>/compile. When the
+              schema cache is disabled, the compile cache is disabled too.
+    """
+
+    def __init__(self, root: Optional[Path] = None):
+        if root is None:
+            base = cache_dir()
+            root = base / "compile" if base is not None else None
+        self.root = root
+        self._digests: Dict[Path, str] = {}
+        self._imports: Dict[Path, List[str]] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.root is not None
+
+    def _digest(self, path: Path) -> str:
+        if path not in self._digests:
+            self._digests[path] = hashlib.sha256(path.read_bytes()).hexdigest()
+        return self._digests[path]
+
+    def _file_imports(self, path: Path) -> List[str]:
+        if path not in self._imports:
+            self._imports[path] = _extract_imports(path)
+        return self._imports[path]
+
+    def key(self, proto_file: Path, proto_root: Path, include_paths: Sequence[Path]) -> str:
+        """
+        Hash of the file, its transitive imports, the include paths and the
+        protoc version. Imports are resolved like protoc does with the
+        arguments of proto_compiler._protoc_args: against proto_root, then
+        in include path order.
+        """
+        search = [proto_root, *(inc for inc in include_paths if inc != proto_root)]
+        h = hashlib.sha256()
+        h.update(f"{protoc_version()}\0{proto_file.relative_to(proto_root)}\0".encode())
+        for inc in search:
+            h.update(f"{inc}\0".encode())
+
+        seen = {}
+        stack = [proto_file]
+        while stack:
+            current = stack.pop()
+            if current in seen:
+                continue
+            seen[current] = self._digest(current)
+            for imp in self._file_imports(current):
+                for inc in search:
+                    candidate = inc / imp
+                    if candidate.is_file():
+                        stack.append(candidate)
+                        break
+        for path in sorted(seen):
+            h.update(f"{path}\0{seen[path]}\0".encode())
+        return h.hexdigest()
+
+    def restore(self, key: str, output_dir: Path) -> bool:
+        """
+        Link the cached outputs for key into output_dir. Returns False on a
+        miss.
+
+        Restored files may be hard links into the cache: callers must
+        unlink (not truncate) them before protoc regenerates them, see
+        unlink_outputs.
+        """
+        entry = self.root / key
+        if not (entry / ".complete").exists():
+            return False
+        for src in entry.rglob("*"):
+            if not src.is_file() or src.name == ".complete":
+                continue
+            dest = output_dir / src.relative_to(entry)
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            if dest.exists():
+                dest.unlink()
+            try:
+                os.link(src, dest)
+            except OSError:
+                shutil.copy2(src, dest)
+        return True
+
+    def store(self, key: str, output_dir: Path, outputs: Sequence[Path]):
+        """
+        Copy the generated outputs (relative to output_dir) into the cache.
+        Failures only cost a future cache miss, so they are ignored.
+        """
+        entry = self.root / key
+        if (entry / ".complete").exists():
+            return
+        tmp = None
+        try:
+            self.root.mkdir(parents=True, exist_ok=True)
+            tmp = Path(tempfile.mkdtemp(dir=self.root, prefix=".tmp_"))
+            for rel in outputs:
+                src = output_dir / rel
+                if src.is_file():
+                    (tmp / rel).parent.mkdir(parents=True, exist_ok=True)
+                    shutil.copy2(src, tmp / rel)
+            (tmp / ".complete").touch()
+            os.replace(tmp, entry)
+        except OSError:
+            if tmp is not None:
+                shutil.rmtree(tmp, ignore_errors=True)
+
+
+def unlink_outputs(output_dir: Path, outputs: Sequence[Path]):
+    """
+    Remove existing outputs before protoc rewrites them, so a hard link
+    restored from the cache is replaced rather than written through.
+    """
+    for rel in outputs:
+        try:
+            (output_dir / rel).unlink()
+        except FileNotFoundError:
+            pass
@@ -1,195 +1,324 @@
 """
 Proto Explorer (with search)
 """
-import argparse
-import importlib
-import inspect
 import os
 import re
 from re import Pattern
-import sys
-from typing import Dict
+import time
+from typing import FrozenSet
+
+# Start of the app's imports, for --profile-startup
+_SCRIPT_START = time.perf_counter()
+
 import streamlit as st
-from google.protobuf.descriptor import Descriptor, FieldDescriptor
+
+from .proto_catalog import SchemaLRU, discover_sources, load_source, memory_budget
+from .proto_loader import (  # noqa: F401
+    app_args,
+    import_proto_module,
+    parse_args,
+    validate_proto_module,
+)
+from .proto_profile import StartupProfile, write_phases
+from .proto_render import field_block, highlight, visible_rows
+from .proto_schema import (  # noqa: F401
+    TYPE_NAMES,
+    RowModel,
+    build_row_model,
+    list_message_types,
+    load_schema,
+)
+from .proto_search import build_match_index, message_graph
+from .proto_tree import TreeTable
 
 GITHUB_URL = "https://github.com/yuanlott/grpc"
 
-TYPE_NAMES: Dict[int, str] = {
-    v: k.replace("TYPE_", "")
-    for k, v in FieldDescriptor.__dict__.items()
-    if k.startswith("TYPE_")
-}
+
+@st.cache_resource
+def load_proto_module(module_name: str, search_path: str | None):
+    """Import a compiled _pb2 module dynamically, optionally from a custom path."""
+    return import_proto_module(module_name, search_path)
 
 
-def validate_proto_module(module_name: str) -> bool:
+def descriptor_matches(desc, regex):
     """
-    Verify that the compiled proto module exists
+    Return True if the regex matches anywhere in the subtree of desc.
+
+    Builds a one-off match index; renders should use get_match_index instead
+    so the graph is walked once per regex rather than once per node.
     """
-    try:
-        __import__(module_name)
-        return True
-    except ModuleNotFoundError as e:
-        missing = e.name
-        raise ImportError(
-            f"Failed to import '{module_name}'. Missing: '{missing}'."
-        ) from e
-
-
-def parse_args():
-    """
-    Parse command line arguments
-    """
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--load_path", "-p")
-    parser.add_argument("--proto_module", "-m", required=True)
-    args = parser.parse_args()
-    if args.load_path:
-        abs_path = os.path.abspath(args.load_path)
-        if not os.path.isdir(abs_path):
-            raise ValueError(f"Invalid load_path: {args.load_path}")
-        sys.path.insert(0, abs_path)
-    importlib.util.find_spec(args.proto_module)
-    validate_proto_module(args.proto_module)
-    return args
+    if not regex:
+        return False
+    graph = message_graph(build_row_model([desc]))
+    return desc.full_name in build_match_index(graph, regex)
+
 
 @st.cache_resource
-def load_proto_module(module_name: str, search_path: str | None):
+def load_row_model(
+        module_name: str | None,
+        search_path: str | None,
+        descriptor_set: str | None = None,
+        snapshot: str | None = None,
+        root_files: tuple[str, ...] | None = None,
+):
     """
-    Import compiled proto module
+    Field-row model and message graph of a module (or descriptor set),
+    built once per process, or read from the launcher's snapshot.
     """
-    if search_path and search_path not in sys.path:
-        sys.path.insert(0, os.path.abspath(search_path))
-    return importlib.import_module(module_name)
-
+    message_names, rows = load_schema(
+        module_name, search_path, descriptor_set, snapshot, root_files=root_files
+    )
+    return message_names, rows, message_graph(rows)
 
-def list_message_types(module):
-    messages = {}
-    for _, obj in inspect.getmembers(module):
-        if isinstance(obj, Descriptor):
-            messages[obj.full_name] = obj
-    return messages
 
-
-def descriptor_matches(desc, regex, seen=None):
-    if not regex:
-        return False
-    if seen is None:
-        seen = set()
-    if desc.full_name in seen:
-        return False
-    seen.add(desc.full_name)
-    if regex.search(desc.full_name):
-        return True
-    for f in desc.fields:
-        if regex.search(f.name):
-            return True
-        if f.type == FieldDescriptor.TYPE_MESSAGE and f.message_type:
-            if regex.search(f.message_type.full_name):
-                return True
-            if descriptor_matches(f.message_type, regex, seen):
-                return True
-        if f.type == FieldDescriptor.TYPE_ENUM and f.enum_type:
-            if regex.search(f.enum_type.full_name):
-                return True
-    return False
+@st.cache_resource(max_entries=64)
+def get_match_index(module_name: str, pattern: str, _graph) -> FrozenSet[str]:
+    """
+    Per-regex "subtree contains a match" table, shared across reruns.
+    """
+    return build_match_index(_graph, re.compile(pattern))
 
 
 def show_message(
-        desc,
+        full_name: str,
+        rows: RowModel,
         depth: int = 0,
         shown: set[str] | None = None,
         regex: Pattern | None = None,
-        filter_mode: bool = False
+        filter_mode: bool = False,
+        matches: FrozenSet[str] | None = None,
+        batch: bool = True,
 ):
+    """
+    Render a message and its nested messages as expanders.
+
+    With batch=True each expander's header and field list are sent as one
+    pre-built markdown element instead of one element per field.
+    """
+    if regex and matches is None:
+        matches = build_match_index(message_graph(rows), regex)
     if shown is None:
         shown = set()
-    if desc.full_name in shown:
+    if full_name in shown:
         return
-    shown.add(desc.full_name)
+    shown.add(full_name)
 
-    match_here = regex.search(desc.full_name) if regex else False
+    match_here = regex.search(full_name) if regex else False
 
     # expander TITLE → must be plain
-    header_plain = desc.full_name
+    header_plain = full_name
     # expander BODY → can contain HTML highlighting
-    header_display = desc.full_name
+    header_display = full_name
     if match_here:
         header_display = regex.sub(
             lambda m: f"<mark>{m.group()}</mark>", header_display
         )
 
-    expand = bool(depth == 0 or (regex and descriptor_matches(desc, regex)))
+    expand = bool(depth == 0 or (regex and full_name in matches))
 
     with st.expander(header_plain, expanded=expand):
+        if batch:
+            kept = visible_rows(rows[full_name], regex, matches, filter_mode)
+            block = f"**{highlight(full_name, regex)}**"
+            if kept:
+                block += "\n\n" + field_block(kept, regex)
+            st.markdown(block, unsafe_allow_html=True)
+            for row in kept:
+                if row.child:
+                    show_message(
+                        row.child, rows, depth+1, shown, regex, filter_mode,
+                        matches, batch
+                    )
+            return
+
         # Show highlighted header inside if matched
         if regex:
             st.markdown(f"**{header_display}**", unsafe_allow_html=True)
         else:
             st.markdown(f"**{header_plain}**")
 
-        for field in desc.fields:
-            is_map = (
-                field.type == FieldDescriptor.TYPE_MESSAGE
-                and field.message_type
-                and field.message_type.GetOptions().map_entry
-            )
-            if field.type == FieldDescriptor.TYPE_MESSAGE and field.message_type:
-                if is_map:
-                    key_type = TYPE_NAMES.get(field.message_type.fields_by_name["key"].type, "UNKNOWN")
-                    v = field.message_type.fields_by_name["value"]
-                    if v.type == FieldDescriptor.TYPE_MESSAGE and v.message_type:
-                        val = v.message_type.full_name
-                    else:
-                        val = TYPE_NAMES.get(v.type, "UNKNOWN")
-                    type_name = f"map<{key_type},{val}>"
-                else:
-                    type_name = field.message_type.full_name
-            elif field.type == FieldDescriptor.TYPE_ENUM and field.enum_type:
-                type_name = field.enum_type.full_name
-            else:
-                type_name = TYPE_NAMES.get(field.type, str(field.type))
-
-            label = f"- {field.name}: {type_name}"
+        for row in rows[full_name]:
+            label = f"- {row.text}"
             match_field = regex.search(label) if regex else False
 
             if (
-                field.type == FieldDescriptor.TYPE_MESSAGE and
-                field.message_type is not None
+                row.child
+                and regex
+                and not match_field
+                and row.child not in matches
             ):
-                if (
-                    regex
-                    and not match_field
-                    and not descriptor_matches(field.message_type, regex)
-                ):
-                    if filter_mode:
-                        continue
+                if filter_mode:
+                    continue
 
             if match_field:
                 label = regex.sub(lambda m: f"<mark>{m.group()}</mark>", label)
 
             st.markdown(" " * depth * 2 + label, unsafe_allow_html=True)
 
-            if field.type == FieldDescriptor.TYPE_MESSAGE and not is_map:
+            if row.child:
                 show_message(
-                    field.message_type, depth+1, shown, regex, filter_mode
+                    row.child, rows, depth+1, shown, regex, filter_mode,
+                    matches, batch
                 )
 
 
-def main():
-    args = parse_args()
+# Session state keys and page size of the tree-table view
+TREE_OPEN_KEY = "proto_tree_open"
+TREE_WINDOW_KEY = "proto_tree_window"
+TREE_VERSION_KEY = "proto_tree_version"
+TREE_SCROLL_KEY = "proto_tree_scroll"
+TREE_PAGE_SIZE = 100
+
+
+def _on_tree_select():
+    """Dataframe selection callback: open or close the clicked node."""
+    version = st.session_state.get(TREE_VERSION_KEY, 0)
+    event = st.session_state.get(f"proto_tree_table_{version}")
+    selected = event.selection.rows if event else []
+    if not selected:
+        return
+    path = st.session_state[TREE_WINDOW_KEY][selected[0]]
+    if path is not None:
+        st.session_state[TREE_OPEN_KEY].symmetric_difference_update({path})
+    # A fresh widget key clears the selection for the next click
+    st.session_state[TREE_VERSION_KEY] = version + 1
+
+
+def show_tree_table(message_names: list[str], rows: RowModel):
+    """
+    Show the whole hierarchy as a scroll-windowed tree table.
+
+    Only the rows of the current window are computed and sent to the
+    browser; clicking an expandable row opens or closes it.
+    """
+    open_nodes = st.session_state.setdefault(TREE_OPEN_KEY, set())
+    table = TreeTable(message_names, rows, open_nodes)
+    total = len(table)
+
+    start = 0
+    if total > TREE_PAGE_SIZE:
+        # Keep the scroll position valid after nodes are collapsed
+        if st.session_state.get(TREE_SCROLL_KEY, 0) > total - 1:
+            st.session_state[TREE_SCROLL_KEY] = total - 1
+        start = st.slider("Scroll", 0, total - 1, step=1, key=TREE_SCROLL_KEY)
+
+    window = table.window(start, TREE_PAGE_SIZE)
+    st.session_state[TREE_WINDOW_KEY] = [
+        row.path if row.expandable else None for row in window
+    ]
+    st.caption(f"Rows {start + 1}–{start + len(window)} of {total}")
+
+    def marker(row):
+        if not row.expandable:
+            return "\u00a0\u00a0"
+        return "▾ " if row.expanded else "▸ "
+
+    st.dataframe(
+        {
+            "Field": [
+                "\u00a0" * row.depth * 4 + marker(row) + row.name for row in window
+            ],
+            "Type": [row.type_name for row in window],
+            "#": [row.number for row in window],
+            "Label": [row.label for row in window],
+        },
+        key=f"proto_tree_table_{st.session_state.get(TREE_VERSION_KEY, 0)}",
+        on_select=_on_tree_select,
+        selection_mode="single-row",
+        hide_index=True,
+        width="stretch",
+        height=min(len(window), 30) * 35 + 38,
+    )
+
+
+# URL query parameter and session state key of the selected catalog schema
+SCHEMA_PARAM = "schema"
+SCHEMA_KEY = "proto_schema"
+
+
+@st.cache_resource
+def load_catalog(
+        entries: tuple[str, ...],
+        load_path: str | None,
+        max_memory_mb: float | None,
+):
+    """
+    Sources of a --catalog and the LRU of their loaded schemas, shared by
+    every session of the server process.
+    """
+    sources = discover_sources(entries, load_path)
+
+    def load(label: str):
+        message_names, rows = load_source(sources[label])
+        return message_names, rows, message_graph(rows)
+
+    return sources, SchemaLRU(load, memory_budget(max_memory_mb))
+
+
+def select_schema(labels: list[str]) -> str:
+    """
+    Sidebar schema selector, kept in sync with the ?schema= URL parameter
+    so a link opens the same schema.
+    """
+    requested = st.query_params.get(SCHEMA_PARAM)
+    index = labels.index(requested) if requested in labels else 0
+    label = st.sidebar.selectbox("Schema", labels, index=index)
+    if st.query_params.get(SCHEMA_PARAM) != label:
+        st.query_params[SCHEMA_PARAM] = label
+    if st.session_state.get(SCHEMA_KEY) != label:
+        # Tree-table state refers to the previous schema's nodes
+        st.session_state[SCHEMA_KEY] = label
+        st.session_state.pop(TREE_OPEN_KEY, None)
+        st.session_state.pop(TREE_SCROLL_KEY, None)
+    return label
+
+
+def main(profile: StartupProfile | None = None):
+    profile = profile or StartupProfile()
+    with profile.phase("app: argument parsing"):
+        args = app_args()
     st.set_page_config(page_title="Proto Explorer", layout="wide")
 
     st.title("🧭 Proto Explorer")
 
-    module = load_proto_module(args.proto_module, search_path=args.load_path)
-    messages = list_message_types(module)
-    if not messages:
+    if args.catalog:
+        sources, schemas = load_catalog(
+            tuple(args.catalog), args.load_path, args.max_memory_mb
+        )
+        if not sources:
+            st.warning("No schemas found in the catalog.")
+            return
+        schema_key = select_schema(list(sources))
+        try:
+            with profile.phase("app: schema load", schema=schema_key):
+                message_names, rows, graph = schemas.get(schema_key)
+        except (ValueError, ImportError) as e:
+            st.error(f"Could not load `{schema_key}`.\n\n{e}")
+            return
+    else:
+        schema_key = args.proto_module or args.descriptor_set
+        with profile.phase("app: schema load", snapshot=bool(args.snapshot)):
+            message_names, rows, graph = load_row_model(
+                args.proto_module, args.load_path, args.descriptor_set, args.snapshot,
+                tuple(args.root_file or ()),
+            )
+    if not message_names:
         st.warning("No messages found.")
         return
 
-    selected = st.sidebar.selectbox("Select message", sorted(messages.keys()))
+    view = st.sidebar.radio("View", ["Expanders", "Tree table"], horizontal=True)
+    if view == "Tree table":
+        show_tree_table(message_names, rows)
+        return
+
+    selected = st.sidebar.selectbox("Select message", message_names)
     search_str = st.sidebar.text_input("Regex Search")
     filter_mode = st.sidebar.checkbox("Show only matching branches")
+    batch = st.sidebar.checkbox(
+        "Batch field rows",
+        value=True,
+        help="Send each message's field list as a single element.",
+    )
 
     try:
         regex = re.compile(search_str) if search_str else None
@@ -197,8 +326,28 @@ def main():
         st.sidebar.error("Invalid regex")
         regex = None
 
-    show_message(messages[selected], regex=regex, filter_mode=filter_mode)
+    matches = None
+    if regex:
+        matches = get_match_index(schema_key, regex.pattern, graph)
+
+    show_message(
+        selected, rows, regex=regex, filter_mode=filter_mode, matches=matches,
+        batch=batch
+    )
 
 
-if __name__ == "__main__":
-    main()
+def run():
+    """
+    Run the app; on the first completed run with --profile-out, write its
+    startup phases there for the launcher's --profile-startup report.
+    """
+    profile = StartupProfile()
+    profile.add("app: script imports", time.perf_counter() - _SCRIPT_START)
+    start = time.perf_counter()
+    main(profile)
+    out = app_args().profile_out
+    if out and not os.path.exists(out):
+        timed = sum(p.seconds for p in profile.phases[1:])
+        profile.add("app: first render", time.perf_counter() - start - timed)
+        write_phases(out, profile)
+
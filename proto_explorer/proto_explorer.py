@@ -1,234 +1,198 @@
 """
 Proto Explorer (no search)
 """
-import argparse
-import importlib
-import inspect
-import os
-import sys
-from typing import Dict
 import streamlit as st
-from google.protobuf.descriptor import Descriptor, FieldDescriptor
 
+from .proto_loader import (  # noqa: F401
+    app_args,
+    import_proto_module,
+    parse_args,
+    validate_proto_module,
+)
+from .proto_render import field_block
+from .proto_schema import (  # noqa: F401
+    TYPE_NAMES,
+    FieldRow,
+    RowModel,
+    build_row_model,
+    list_message_types,
+    load_schema,
+)
 
-GITHUB_URL = "https://github.com/yuanlott/grpc"
-
-# A mapping from protobuf field type integer values to their corresponding
-# string names. Created by inverting the FieldDescriptor.TYPE_* constants.
-# No official constant table is exported by the protobuf package for numeric
-# type IDs, so here we generate it dynamically from the library itself.
-# Expected contents: {
-# 1: "DOUBLE", 2: "FLOAT", 3: "INT64", 4: "UINT64", 5: "INT32", 6: "FIXED64",
-# 7: "FIXED32", 8: "BOOL", 9: "STRING", 11: "MESSAGE", 12: "BYTES",
-# 13: "UINT32", 14: "ENUM", 15: "SFIXED32", 16: "SFIXED64", 17: "SINT32",
-# 18: "SINT64",
-# }
-TYPE_NAMES: Dict[int, str] = {
-    v: k.replace("TYPE_", "")
-    for k, v in FieldDescriptor.__dict__.items()
-    if k.startswith("TYPE_")
-}
-
-
-def validate_proto_module(module_name: str):
-    """
-    Try to import the target _pb2 module and catch dependency errors.
-    """
-    try:
-        __import__(module_name)
-        return True
-    except ModuleNotFoundError as e:
-        missing = e.name
-        raise ImportError(
-            f"Failed to import '{module_name}'. Missing dependency: '{missing}'. "
-            f"This usually means the package isn't installed or _pb2 has bad imports."
-        ) from e
-    except Exception as e:
-        raise ImportError(f"Error importing '{module_name}': {e}") from e
-
-
-def parse_args():
-    parser = argparse.ArgumentParser(
-        description="Interactive viewer for gRPC .proto hierarchies."
-    )
-    parser.add_argument(
-        "--load_path",
-        "-p",
-        help="Path to directory containing _pb2.py files (will added to runtime sys.path).",
-        required=False,
-    )
-    parser.add_argument(
-        "--proto_module",
-        "-m",
-        help="Python module name of the _pb2 file to load, e.g. myproject.datamanager.users_pb2.",
-        required=True,
-    )
-    args = parser.parse_args()
-
-    # Validate --load_path
-    if args.load_path:
-        abs_path = os.path.abspath(args.load_path)
-        if not os.path.isdir(abs_path):
-            raise ValueError(f"--load_path '{args.load_path}' is not a valid directory")
-        sys.path.insert(0, abs_path)
-
-    # Validate --module import
-    spec = importlib.util.find_spec(args.proto_module)
-    if spec is None:
-        raise ValueError(
-            f"Cannot import module '{args.proto_module}'. "
-            f"Ensure it exists and check --load_path"
-        )
-
-    validate_proto_module(args.proto_module)
 
-    return args
+GITHUB_URL = "https://github.com/yuanlott/grpc"
 
 
 @st.cache_resource
 def load_proto_module(module_name: str, search_path: str = None):
     """Import a compiled _pb2 module dynamically, optionally from a custom path."""
-    if search_path and search_path not in sys.path:
-        sys.path.insert(0, os.path.abspath(search_path))
-    return importlib.import_module(module_name)
+    return import_proto_module(module_name, search_path)
 
 
-def list_message_types(module):
-    """Return all top-level message types from a _pb2 module."""
-    messages = {}
-    for _, obj in inspect.getmembers(module):
-        if isinstance(obj, Descriptor):
-            messages[obj.full_name] = obj
-    return messages
+@st.cache_resource
+def load_row_model(
+        module_name: str | None,
+        search_path: str = None,
+        descriptor_set: str = None,
+        snapshot: str = None,
+        root_files: tuple[str, ...] = None,
+) -> tuple[list[str], RowModel]:
+    """
+    Build the field-row model of a module (or descriptor set) once per
+    server process, or read it from the launcher's snapshot.
+
+    Returns the sorted message names and the rows of every message
+    reachable from them.
+    """
+    return load_schema(
+        module_name, search_path, descriptor_set, snapshot, root_files=root_files
+    )
+
 
+def _split_oneofs(rows) -> tuple[list[FieldRow], dict[str, list[FieldRow]]]:
+    """Split field rows into regular rows and oneof_name → rows groups."""
+    regular_rows = []
+    oneof_rows = {}
+    for row in rows:
+        if row.oneof:
+            oneof_rows.setdefault(row.oneof, []).append(row)
+        else:
+            regular_rows.append(row)
+    return regular_rows, oneof_rows
 
-def show_message(desc: Descriptor, depth=0, shown=None):
-    """Recursively show fields of a protobuf message descriptor, including oneof hierarchies."""
+
+def show_message(full_name: str, rows: RowModel, depth=0, shown=None, batch=False):
+    """
+    Recursively show fields of a protobuf message, including oneof hierarchies.
+
+    With batch=True each expander's field list is emitted as one markdown
+    element, followed by the expanders of its nested messages.
+    """
     if shown is None:
         shown = set()
 
-    if desc.full_name in shown:
-        st.write(f"{'  ' * depth}↪ {desc.full_name} (recursive)")
+    if full_name in shown:
+        st.write(f"{'  ' * depth}↪ {full_name} (recursive)")
         return
 
-    shown.add(desc.full_name)
-
-    # Map of oneof_name → fields
-    oneof_fields = {}
-    for field in desc.fields:
-        if field.containing_oneof:
-            oneof_name = field.containing_oneof.name
-            oneof_fields.setdefault(oneof_name, []).append(field)
+    shown.add(full_name)
+
+    regular_rows, oneof_rows = _split_oneofs(rows[full_name])
+
+    with st.expander(f"{full_name}", expanded=(depth == 0)):
+        if batch:
+            if regular_rows:
+                st.markdown(field_block(regular_rows), unsafe_allow_html=True)
+            for row in regular_rows:
+                if row.child:
+                    show_message(row.child, rows, depth + 1, shown, batch)
+            for oneof_name, group in oneof_rows.items():
+                st.markdown(f"- **{oneof_name}:** _(oneof)_")
+                nb_indent = "\u00a0" * ((depth + 1) * 2)  # non-breaking spaces
+                with st.expander(f"{nb_indent}(oneof options)", expanded=False):
+                    st.markdown(field_block(group), unsafe_allow_html=True)
+                    for row in group:
+                        if row.child:
+                            show_message(row.child, rows, depth + 2, shown, batch)
+            return
 
-    # Regular (non-oneof) fields
-    regular_fields = [f for f in desc.fields if not f.containing_oneof]
-
-    with st.expander(f"{desc.full_name}", expanded=(depth == 0)):
         # Regular fields
-        for field in regular_fields:
-            # Detect map fields (they are synthetic message types with 'key' and 'value')
-            is_map = (
-                field.type == FieldDescriptor.TYPE_MESSAGE
-                and field.message_type
-                and field.message_type.GetOptions().map_entry
-            )
-
-            # Resolve readable type name
-            if field.type == FieldDescriptor.TYPE_MESSAGE and field.message_type:
-                if is_map:
-                    key_type = TYPE_NAMES.get(
-                        field.message_type.fields_by_name["key"].type, "UNKNOWN"
-                    )
-                    value_field = field.message_type.fields_by_name["value"]
-                    if (
-                        value_field.type == FieldDescriptor.TYPE_MESSAGE
-                        and value_field.message_type
-                    ):
-                        value_type = value_field.message_type.full_name
-                    else:
-                        value_type = TYPE_NAMES.get(value_field.type, "UNKNOWN")
-                    type_name = f"map<{key_type}, {value_type}>"
-                else:
-                    type_name = field.message_type.full_name
-            elif field.type == FieldDescriptor.TYPE_ENUM and field.enum_type:
-                type_name = field.enum_type.full_name
-            else:
-                type_name = getattr(field, "type_name", None) or TYPE_NAMES.get(
-                    field.type, str(field.type)
-                )
-
-            # Field label
-            label = f"- {field.name}: {type_name}"
-            if field.is_repeated and not is_map:
-                label += " [repeated]"
-
+        for row in regular_rows:
+            st.markdown(f"{' ' * depth * 2}- {row.text}")
             # Render message field recursively
-            if (
-                field.type == FieldDescriptor.TYPE_MESSAGE
-                and not is_map
-                and field.message_type
-            ):
-                st.markdown(f"{' ' * depth * 2}{label}")
-                show_message(field.message_type, depth + 1, shown)
-            else:
-                st.markdown(f"{' ' * depth * 2}{label}")
+            if row.child:
+                show_message(row.child, rows, depth + 1, shown, batch)
 
         # Oneof groups
-        for oneof_name, fields in oneof_fields.items():
+        for oneof_name, group in oneof_rows.items():
             st.markdown(f"{' ' * depth * 2}- **{oneof_name}:** _(oneof)_")
             nb_indent = "\u00a0" * ((depth + 1) * 2)  # non-breaking spaces
             with st.expander(f"{nb_indent}(oneof options)", expanded=False):
-                for field in fields:
-                    is_map = (
-                        field.type == FieldDescriptor.TYPE_MESSAGE
-                        and field.message_type
-                        and field.message_type.GetOptions().map_entry
-                    )
-
-                    if (
-                        field.type == FieldDescriptor.TYPE_MESSAGE
-                        and field.message_type
-                    ):
-                        if is_map:
-                            key_type = TYPE_NAMES.get(
-                                field.message_type.fields_by_name["key"].type, "UNKNOWN"
-                            )
-                            value_field = field.message_type.fields_by_name["value"]
-                            if (
-                                value_field.type == FieldDescriptor.TYPE_MESSAGE
-                                and value_field.message_type
-                            ):
-                                value_type = value_field.message_type.full_name
-                            else:
-                                value_type = TYPE_NAMES.get(value_field.type, "UNKNOWN")
-                            type_name = f"map<{key_type}, {value_type}>"
-                        else:
-                            type_name = field.message_type.full_name
-                    elif field.type == FieldDescriptor.TYPE_ENUM and field.enum_type:
-                        type_name = field.enum_type.full_name
-                    else:
-                        type_name = getattr(field, "type_name", None) or TYPE_NAMES.get(
-                            field.type, str(field.type)
-                        )
-
-                    label = f"- {field.name}: {type_name}"
-
-                    if field.is_repeated and not is_map:
-                        label += " [repeated]"
-
-                    if (
-                        field.type == FieldDescriptor.TYPE_MESSAGE
-                        and not is_map
-                        and field.message_type
-                    ):
-                        st.markdown(f"{' ' * (depth + 1) * 2}{label}")
-                        show_message(field.message_type, depth + 2, shown)
-                    else:
-                        st.markdown(f"{' ' * (depth + 1) * 2}{label}")
+                for row in group:
+                    st.markdown(f"{' ' * (depth + 1) * 2}- {row.text}")
+                    if row.child:
+                        show_message(row.child, rows, depth + 2, shown, batch)
+
+
+# Session state key holding the node paths opened in the lazy tree view
+OPEN_NODES_KEY = "proto_explorer_open_nodes"
+
+
+def _toggle_node(node_key: str):
+    """Button callback: flip the open/closed state of a lazy tree node."""
+    open_nodes = st.session_state.setdefault(OPEN_NODES_KEY, set())
+    open_nodes.symmetric_difference_update({node_key})
+
+
+def _show_field_lazy(
+        row: FieldRow,
+        rows: RowModel,
+        path: tuple[str, ...],
+        ancestors: frozenset[str],
+):
+    """Render a single field row; message fields become open/close toggles."""
+    if not row.child:
+        st.markdown(f"- {row.text}")
+        return
+
+    if row.child in ancestors:
+        st.markdown(f"- {row.text} ↪ _(recursive)_")
+        return
+
+    child_path = path + (row.name,)
+    node_key = "lazy:" + ".".join(child_path)
+    is_open = node_key in st.session_state.setdefault(OPEN_NODES_KEY, set())
+    st.button(
+        f"{'▾' if is_open else '▸'} {row.text}",
+        key=node_key,
+        on_click=_toggle_node,
+        args=(node_key,),
+        type="tertiary",
+    )
+    # Collapsed branches are never walked: the subtree is only visited
+    # on the rerun after the user opens this node.
+    if is_open:
+        with st.container(border=True):
+            show_message_lazy(row.child, rows, child_path, ancestors)
+
+
+def show_message_lazy(
+        full_name: str,
+        rows: RowModel,
+        path: tuple[str, ...] | None = None,
+        ancestors: frozenset[str] = frozenset(),
+):
+    """
+    Render the fields of a message one level at a time.
+
+    Unlike show_message, nested messages are not rendered up front: each one
+    is shown as a toggle whose open/closed state lives in st.session_state,
+    and its fields are only walked while it is open.
+
+    Args:
+        full_name: Full name of the message to render.
+        rows: Field-row model containing the message.
+        path: Field path from the selected root, used to key the node state.
+        ancestors: Full names of the messages on the current path, used to
+                   stop at recursive references.
+    """
+    if path is None:
+        path = (full_name,)
+    ancestors = ancestors | {full_name}
+
+    regular_rows, oneof_rows = _split_oneofs(rows[full_name])
+    for row in regular_rows:
+        _show_field_lazy(row, rows, path, ancestors)
+
+    for oneof_name, group in oneof_rows.items():
+        st.markdown(f"- **{oneof_name}:** _(oneof)_")
+        with st.container(border=True):
+            for row in group:
+                _show_field_lazy(row, rows, path, ancestors)
 
 
 def main():
-    args = parse_args()
+    args = app_args()
     st.set_page_config(
         page_title="Proto Explorer",
         page_icon="🧭",
@@ -287,19 +251,38 @@ def main():
     custom_path = args.load_path
 
     try:
-        module = load_proto_module(module_name, search_path=custom_path)
+        message_names, rows = load_row_model(
+            module_name,
+            search_path=custom_path,
+            descriptor_set=args.descriptor_set,
+            snapshot=args.snapshot,
+            root_files=tuple(args.root_file or ()),
+        )
     except ModuleNotFoundError as e:
         st.error(f"Could not import `{module_name}`. Check the path.\n\n{e}")
         return
+    except ValueError as e:
+        st.error(f"Could not load `{args.descriptor_set}`.\n\n{e}")
+        return
 
-    messages = list_message_types(module)
-    if not messages:
+    if not message_names:
         st.warning("No message types found in this module.")
         return
 
-    selected = st.sidebar.selectbox("Select a message type", sorted(messages.keys()))
-    show_message(messages[selected])
-
-
-if __name__ == "__main__":
-    main()
+    selected = st.sidebar.selectbox("Select a message type", message_names)
+    lazy = st.sidebar.checkbox(
+        "Expand on demand",
+        value=True,
+        help="Only render nested messages once they are opened.",
+    )
+    batch = st.sidebar.checkbox(
+        "Batch field rows",
+        value=True,
+        disabled=lazy,
+        help="Send each message's field list as a single element.",
+    )
+    if lazy:
+        with st.expander(selected, expanded=True):
+            show_message_lazy(selected, rows)
+    else:
+        show_message(selected, rows, batch=batch)
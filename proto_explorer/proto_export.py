@@ -0,0 +1,199 @@
+"""
+Module to export a message hierarchy as one self-contained HTML file.
+
+Every message is written once, as a <template>; nested messages are cloned
+into place by a few lines of JavaScript when their <details> is opened, so
+the file grows with the number of fields rather than with the number of
+paths through the hierarchy. The file is streamed to disk message by
+message.
+"""
+import argparse
+import html
+import os
+from pathlib import Path
+from typing import Iterable, TextIO
+
+from .proto_loader import add_module_args, resolve_module_args, schema_label
+from .proto_schema import FieldRow, RowModel, load_schema
+
+_HEAD = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<style>
+body {{ font-family: system-ui, sans-serif; margin: 2rem; }}
+ul {{ list-style: none; padding-left: 1.2rem; margin: 0.1rem 0; }}
+summary {{ cursor: pointer; }}
+.oneof {{ color: #888; font-style: italic; }}
+.hit > summary, li.hit {{ background: #fff3a0; }}
+#search {{ width: 24rem; padding: 0.3rem; margin-bottom: 1rem; }}
+</style>
+</head>
+<body>
+<h1>&#x1F9ED; {title}</h1>
+<input id="search" type="search" placeholder="Regex search">
+<span id="status"></span>
+"""
+
+_SCRIPT = """<script>
+(function () {
+  // Clone a message's fields into its <details> the first time it opens.
+  function fill(d) {
+    if (d.dataset.filled) return;
+    var t = document.getElementById("t:" + d.dataset.ref);
+    if (t) d.appendChild(t.content.cloneNode(true));
+    d.dataset.filled = "1";
+    mark(d);
+  }
+  document.addEventListener("toggle", function (e) {
+    var d = e.target;
+    if (d.tagName === "DETAILS" && d.open && d.dataset.ref) fill(d);
+  }, true);
+
+  // name -> searchable texts and name -> referencing messages, read once
+  var texts = {}, parents = {};
+  document.querySelectorAll("template").forEach(function (t) {
+    var name = t.id.slice(2);
+    texts[name] = [name];
+    t.content.querySelectorAll("li").forEach(function (li) {
+      texts[name].push(li.dataset.t);
+    });
+    t.content.querySelectorAll("details[data-ref]").forEach(function (d) {
+      (parents[d.dataset.ref] = parents[d.dataset.ref] || []).push(name);
+    });
+  });
+
+  var regex = null, matched = {};
+  function mark(root) {
+    root.querySelectorAll("li[data-t]").forEach(function (li) {
+      li.classList.toggle("hit", !!regex && regex.test(li.dataset.t));
+    });
+  }
+  function search(pattern) {
+    var status = document.getElementById("status");
+    try {
+      regex = pattern ? new RegExp(pattern) : null;
+      status.textContent = "";
+    } catch (err) {
+      regex = null;
+      status.textContent = "Invalid regex";
+    }
+    matched = {};
+    if (regex) {
+      var queue = Object.keys(texts).filter(function (n) {
+        return texts[n].some(function (s) { return regex.test(s); });
+      });
+      queue.forEach(function (n) { matched[n] = true; });
+      // Propagate "subtree contains a match" to every referencing message.
+      while (queue.length) {
+        (parents[queue.pop()] || []).forEach(function (p) {
+          if (!matched[p]) {
+            matched[p] = true;
+            queue.push(p);
+          }
+        });
+      }
+    }
+    document.querySelectorAll("#roots > li").forEach(function (li) {
+      li.hidden = !!regex && !matched[li.dataset.ref];
+      li.classList.toggle("hit", !!regex && !!matched[li.dataset.ref]);
+    });
+    mark(document);
+  }
+  document.getElementById("search").addEventListener("input", function (e) {
+    search(e.target.value);
+  });
+})();
+</script>
+</body>
+</html>
+"""
+
+
+def _write_rows(out: TextIO, rows: Iterable[FieldRow]):
+    """Write the <li> elements of one message's fields."""
+    for row in rows:
+        text = html.escape(row.text, quote=False)
+        oneof = (
+            f' <span class="oneof">oneof {html.escape(row.oneof, quote=False)}</span>'
+            if row.oneof else ""
+        )
+        attr = html.escape(row.text)
+        if row.child:
+            ref = html.escape(row.child)
+            out.write(
+                f'<li data-t="{attr}"><details data-ref="{ref}">'
+                f"<summary>{text}{oneof}</summary></details></li>\n"
+            )
+        else:
+            out.write(f'<li data-t="{attr}">- {text}{oneof}</li>\n')
+
+
+def write_html(out: TextIO, roots: Iterable[str], rows: RowModel, title: str = "Proto Explorer"):
+    """
+    Stream the HTML document for a row model to an open text file.
+
+    Args:
+        out: Writable text stream.
+        roots: Top-level message full names, in display order.
+        rows: Field-row model covering every message reachable from roots.
+        title: Page title.
+    """
+    out.write(_HEAD.format(title=html.escape(title)))
+    for full_name, field_rows in rows.items():
+        out.write(f'<template id="t:{html.escape(full_name)}"><ul>\n')
+        _write_rows(out, field_rows)
+        out.write("</ul></template>\n")
+    out.write('<ul id="roots">\n')
+    for full_name in roots:
+        ref = html.escape(full_name)
+        out.write(
+            f'<li data-ref="{ref}"><details data-ref="{ref}">'
+            f"<summary>{html.escape(full_name, quote=False)}</summary></details></li>\n"
+        )
+    out.write("</ul>\n")
+    out.write(_SCRIPT)
+
+
+def export_html(roots: Iterable[str], rows: RowModel, out_path: str | Path, title: str = "Proto Explorer") -> Path:
+    """
+    Write a self-contained HTML explorer for a row model to out_path.
+
+    Returns:
+        Path of the written file.
+    """
+    out_path = Path(out_path)
+    with out_path.open("w", encoding="utf-8") as out:
+        write_html(out, roots, rows, title)
+    return out_path
+
+
+def main(argv: list[str] | None = None):
+    """
+    Entry point of `proto-explorer export-html`.
+    """
+    parser = argparse.ArgumentParser(
+        prog="proto-explorer export-html",
+        description="Export the message hierarchy as a static HTML file.",
+    )
+    add_module_args(parser)
+    parser.add_argument(
+        "--output",
+        "-o",
+        help="Output HTML file (default: <proto_module>.html, or the "
+             "descriptor set's file name with .html).",
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        resolve_module_args(args)
+    except (ValueError, ImportError) as e:
+        parser.error(str(e))
+
+    roots, rows = load_schema(args.proto_module, args.load_path, args.descriptor_set)
+    label = schema_label(args)
+    # Only a file name has an extension to drop; module names are dotted
+    stem = os.path.splitext(label)[0] if args.descriptor_set else label
+    out_path = export_html(roots, rows, args.output or f"{stem}.html", title=label)
+    print(f"Exported {len(roots)} messages to {out_path}")
@@ -2,27 +2,171 @@
 Module for the logic to try finding the proto import root directory
 that can be used as --proto_path argument.
 """
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import re
-from typing import List, Optional, Tuple
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence, Set, Tuple
 
 
-_IMPORT_RE = re.compile(r'^\s*import\s+(?:public|weak\s+)?\"([^\"]+)\"\s*;', re.MULTILINE)
+# Tokens of a .proto header: comments and strings (unterminated ones run
+# to the end of the data read so far), identifiers and single characters
+_HEADER_TOKEN_RE = re.compile(
+    rb"//[^\n]*"
+    rb"|/\*.*?(?:\*/|\Z)"
+    rb'|"(?:[^"\\\n]|\\.)*(?:"|\Z)'
+    rb"|'(?:[^'\\\n]|\\.)*(?:'|\Z)"
+    rb"|[A-Za-z_][A-Za-z0-9_.]*"
+    rb"|\S",
+    re.DOTALL,
+)
+
+# Imports sit before the first top-level definition
+_BODY_KEYWORDS = {b"message", b"service", b"enum", b"extend"}
+
+_HEADER_CHUNK = 8192
+
+# Below this many files per worker, threads cost more than they save
+_MIN_FILES_PER_WORKER = 32
+
+
+def _decode(raw: bytes) -> str:
+    try:
+        return raw.decode("utf-8")
+    except UnicodeDecodeError:
+        return raw.decode("latin-1")
+
+
+def _scan_header(data: bytes, eof: bool) -> Tuple[List[str], bool]:
+    """
+    Collect the imports of a .proto header.
+
+    Returns the imports and whether the header ended in data (a top-level
+    definition or the end of the file was reached).
+    """
+    imports: List[str] = []
+    statement_start = True
+    in_import = False
+    for m in _HEADER_TOKEN_RE.finditer(data):
+        token = m.group()
+        if not eof and m.end() == len(data):
+            # The last token may continue past what was read so far
+            return imports, False
+        if token[:2] in (b"//", b"/*"):
+            continue
+        if in_import:
+            if token[:1] in (b'"', b"'"):
+                imports.append(_decode(token[1:-1]))
+            elif token in (b"public", b"weak"):
+                continue
+            in_import = False
+        elif statement_start:
+            if token in _BODY_KEYWORDS:
+                return imports, True
+            in_import = token == b"import"
+        statement_start = token in (b";", b"}")
+    return imports, eof
+
+
+@functools.lru_cache(maxsize=65536)
+def _header_imports(path: str, mtime_ns: int, size: int) -> Tuple[str, ...]:
+    # mtime_ns and size only key the cache
+    data = b""
+    chunk_size = _HEADER_CHUNK
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(chunk_size)
+            data += chunk
+            imports, done = _scan_header(data, eof=not chunk)
+            if done:
+                return tuple(imports)
+            # Grow reads so that rescanning a long header stays linear
+            chunk_size *= 2
 
 
 def _extract_imports(proto_file: Path) -> List[str]:
     """
     Return a list of import paths as they appear in the .proto file,
     e.g., ["api/common/common.proto", "google/type/quaternion.proto"].
+
+    Only the header is read, up to the first message, service, enum or
+    extend definition; comments are skipped. Results are cached until the
+    file changes.
     """
-    try:
-        text = proto_file.read_text(encoding="utf-8")
-    except UnicodeDecodeError:
-        text = proto_file.read_text(encoding="latin-1")
-    return _IMPORT_RE.findall(text)
+    st = os.stat(proto_file)
+    return list(_header_imports(str(proto_file), st.st_mtime_ns, st.st_size))
 
 
-def _score_candidate(candidate: Path, proto_file: Path, imports: List[str]) -> Tuple[int, int]:
+def scan_imports(
+        proto_files: Iterable[str | Path],
+        workers: int | None = None,
+) -> Dict[Path, List[str]]:
+    """
+    Extract the imports of many .proto files across a thread pool, so a
+    large tree is limited by I/O rather than by one core.
+    """
+    files = [Path(f) for f in proto_files]
+    if len(files) < 2 * _MIN_FILES_PER_WORKER:
+        return {f: _extract_imports(f) for f in files}
+    workers = workers or min(32, (os.cpu_count() or 1) + 4)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return dict(zip(files, pool.map(_extract_imports, files)))
+
+
+class _PathFs:
+    """Existence checks straight on the filesystem, for one-off lookups."""
+
+    exists = staticmethod(os.path.exists)
+    is_dir = staticmethod(os.path.isdir)
+
+
+class _ListingFs:
+    """
+    Existence checks answered from memoized directory listings, so that
+    files sharing ancestors and imports cost one scandir per directory
+    rather than one stat per (candidate, import) pair.
+    """
+
+    def __init__(self):
+        # Directory -> (entry names, names of the entries that are directories),
+        # None when it cannot be listed
+        self._listings: Dict[str, Optional[Tuple[FrozenSet[str], FrozenSet[str]]]] = {}
+        self._exists: Dict[str, bool] = {}
+
+    def _listing(self, directory: str) -> Optional[Tuple[FrozenSet[str], FrozenSet[str]]]:
+        if directory not in self._listings:
+            try:
+                with os.scandir(directory) as it:
+                    entries = list(it)
+                names = frozenset(e.name for e in entries)
+                dirs = frozenset(e.name for e in entries if e.is_dir())
+                self._listings[directory] = (names, dirs)
+            except OSError:
+                self._listings[directory] = None
+        return self._listings[directory]
+
+    def exists(self, path: str) -> bool:
+        if path not in self._exists:
+            directory, name = os.path.split(path)
+            listing = self._listing(directory)
+            self._exists[path] = listing is not None and name in listing[0]
+        return self._exists[path]
+
+    def is_dir(self, path: str) -> bool:
+        directory, name = os.path.split(path)
+        if not name:
+            return os.path.isdir(path)
+        listing = self._listing(directory)
+        return listing is not None and name in listing[1]
+
+
+def _score_candidate(
+        candidate: str,
+        proto_file: str,
+        imports: List[str],
+        fs=_PathFs,
+) -> Tuple[int, int]:
     """
     Score a candidate root directory.
 
@@ -34,77 +178,53 @@ def _score_candidate(candidate: Path, proto_file: Path, imports: List[str]) -> T
     """
     resolved = 0
     for imp in imports:
-        if (candidate / imp).exists():
+        if fs.exists(os.path.join(candidate, imp)):
             resolved += 1
 
     # Does the candidate look like the proto import root?
     # e.g., for /a/b/new/api/model/v1/model.proto, if candidate=/a/b,
     # then (candidate/"new") should exist as a directory.
     bonus = 0
-    try:
-        rel = proto_file.relative_to(candidate)
-        rel_parts = rel.parts
-        if len(rel_parts) >= 2 and (candidate / rel_parts[0]).is_dir():
+    prefix = candidate.rstrip(os.sep) + os.sep
+    if proto_file.startswith(prefix):
+        rel_parts = proto_file[len(prefix):].split(os.sep)
+        if len(rel_parts) >= 2 and fs.is_dir(prefix + rel_parts[0]):
             bonus = 1
-    except ValueError:
-        # proto_file is not under candidate; ignore
-        pass
 
     return resolved, bonus
 
 
-def find_proto_root(proto_file: str | Path, max_levels: int = 16) -> Path:
-    """
-    Given an absolute or relative path to a .proto file, try to infer the
-    proto import root directory suitable for --proto_path argument.
-
-    Strategy:
-      1) Parse import statements from the .proto.
-      2) Walk up candidate ancestors of the proto file's parent directory.
-      3) For each candidate, count how many imports exist under it.
-      4) Choose the candidate with the highest score.
-      5) Fallback to proto's parent if nothing matches.
-
-    Examples:
-      /repo/protos/new/api/model/v1/model.proto
-        imports "api/common/common.proto"
-      -> returns /repo/protos/new
-
-    Returns:
-      Path to the inferred proto root (existing directory).
-
-    Notes:
-      This is heuristic but works well for typical repo layouts.
-      It assumes there is one root. Multiple roots? Later.
-    """
+def _resolve_proto_file(proto_file: str | Path) -> Path:
     p = Path(proto_file).resolve()
     if not p.exists():
         raise FileNotFoundError(f"Proto file not found: {p}")
     if p.suffix != ".proto":
         raise ValueError(f"Expected a .proto file, got: {p}")
+    return p
 
-    imports = _extract_imports(p)
 
+def _choose_root(p: Path, imports: List[str], max_levels: int, fs) -> Path:
     # Build candidate roots: start from the proto's parent, then walk up.
     # Limit to max_levels to avoid scanning the entire filesystem root in
     # unusual setups.
-    candidates: List[Path] = []
-    parent = p.parent
+    proto_file = str(p)
+    candidates: List[str] = []
+    parent = os.path.dirname(proto_file)
     levels = 0
     while True:
         candidates.append(parent)
         levels += 1
-        if parent.parent == parent or levels >= max_levels:
+        if os.path.dirname(parent) == parent or levels >= max_levels:
             break
-        parent = parent.parent
+        parent = os.path.dirname(parent)
 
     # Score candidates format
     # (resolved_count, bonus, path)
-    best: Optional[Tuple[int, int, Path]] = None
+    best: Optional[Tuple[int, int, str]] = None
     for cand in candidates:
-        if not cand.is_dir():
+        if not fs.is_dir(cand):
             continue
-        resolved_count, bonus = _score_candidate(cand, p, imports)
+        resolved_count, bonus = _score_candidate(cand, proto_file, imports, fs)
         if best is None or (resolved_count, bonus) > (best[0], best[1]):
             best = (resolved_count, bonus, cand)
 
@@ -119,4 +239,175 @@ def find_proto_root(proto_file: str | Path, max_levels: int = 16) -> Path:
     if resolved_count == 0 and bonus == 0:
         return p.parent
 
-    return chosen
+    return Path(chosen)
+
+
+def find_proto_root(proto_file: str | Path, max_levels: int = 16) -> Path:
+    """
+    Given an absolute or relative path to a .proto file, try to infer the
+    proto import root directory suitable for --proto_path argument.
+
+    Strategy:
+      1) Parse import statements from the .proto.
+      2) Walk up candidate ancestors of the proto file's parent directory.
+      3) For each candidate, count how many imports exist under it.
+      4) Choose the candidate with the highest score.
+      5) Fallback to proto's parent if nothing matches.
+
+    Examples:
+      /repo/protos/new/api/model/v1/model.proto
+        imports "api/common/common.proto"
+      -> returns /repo/protos/new
+
+    Returns:
+      Path to the inferred proto root (existing directory).
+
+    Notes:
+      This is heuristic but works well for typical repo layouts.
+      It picks the one root the file itself lives under; imports living
+      under other roots (e.g. vendored protos) are covered by
+      find_include_roots. For many files, find_proto_roots shares the
+      filesystem lookups.
+    """
+    p = _resolve_proto_file(proto_file)
+    return _choose_root(p, _extract_imports(p), max_levels, _PathFs)
+
+
+def find_proto_roots(
+        proto_files: Iterable[str | Path],
+        max_levels: int = 16,
+) -> Dict[Path, Path]:
+    """
+    Batch version of find_proto_root: map each (resolved) .proto file to
+    its inferred proto root.
+
+    Directory listings are read once and shared by every file, so a tree
+    of thousands of files sharing ancestors and imports costs one scandir
+    per directory involved instead of a stat per (file, candidate, import).
+
+    Raises:
+        FileNotFoundError or ValueError like find_proto_root.
+    """
+    fs = _ListingFs()
+    files = list(dict.fromkeys(_resolve_proto_file(f) for f in proto_files))
+    imports = scan_imports(files)
+    return {p: _choose_root(p, imports[p], max_levels, fs) for p in files}
+
+
+def _suffix_index(files: Iterable[Path]) -> Dict[str, List[str]]:
+    """
+    Map every trailing path of each file ("c.proto", "b/c.proto",
+    "a/b/c.proto", ...) to the directories that hold it under that name.
+    """
+    index: Dict[str, List[str]] = {}
+    for path in files:
+        parts = path.parts
+        for i in range(1, len(parts) - 1):
+            index.setdefault("/".join(parts[i:]), []).append(str(Path(*parts[:i])))
+    return index
+
+
+@functools.lru_cache(maxsize=32)
+def _include_roots(
+        roots: Tuple[Tuple[str, str, int], ...],
+        include_paths: Tuple[str, ...],
+        search_files: Tuple[str, ...],
+) -> Tuple[Tuple[str, ...], Tuple[Tuple[str, str], ...]]:
+    file_roots = list(dict.fromkeys(root for _, root, _ in roots))
+    index = _suffix_index(Path(f) for f in search_files)
+    imports = {
+        str(path): file_imports
+        for path, file_imports in scan_imports(path for path, _, _ in roots).items()
+    }
+
+    # Imports not found under the include paths nor the file roots, each
+    # with the directories that could serve it
+    covered_by_include: Dict[str, bool] = {}
+    open_imports: Dict[str, Set[str]] = {}
+    for path, file_imports in imports.items():
+        for imp in file_imports:
+            if imp not in covered_by_include:
+                covered_by_include[imp] = any(
+                    os.path.isfile(os.path.join(inc, imp)) for inc in include_paths
+                )
+            if covered_by_include[imp] or imp in open_imports:
+                continue
+            candidates = set(index.get(imp, ()))
+            if candidates and not candidates.intersection(file_roots):
+                open_imports[imp] = candidates
+
+    # Greedy set cover: repeatedly add the directory serving the most open
+    # imports (shallowest first on ties, for stable choices)
+    extra: List[str] = []
+    while open_imports:
+        counts: Dict[str, int] = {}
+        for candidates in open_imports.values():
+            for cand in candidates:
+                counts[cand] = counts.get(cand, 0) + 1
+        best = min(counts, key=lambda cand: (-counts[cand], cand.count(os.sep), cand))
+        extra.append(best)
+        open_imports = {
+            imp: candidates for imp, candidates in open_imports.items()
+            if best not in candidates
+        }
+
+    # A tree file must be compiled under the name it is imported by, or
+    # protoc sees two different files: re-root imported files accordingly
+    chosen = file_roots + extra
+    current = {path: root for path, root, _ in roots}
+    rerooted: Dict[str, str] = {}
+    for file_imports in imports.values():
+        for imp in file_imports:
+            if covered_by_include[imp]:
+                continue
+            for root in chosen:
+                target = os.path.join(root, imp)
+                if target in current:
+                    if current[target] != root:
+                        rerooted.setdefault(target, root)
+                    break
+    final = {**current, **rerooted}
+    include_roots = list(dict.fromkeys(final.values()))
+    include_roots += [root for root in extra if root not in include_roots]
+    return tuple(include_roots), tuple(sorted(rerooted.items()))
+
+
+def find_include_roots(
+        roots: Dict[Path, Path],
+        include_paths: Sequence[Path] = (),
+        search_files: Iterable[str | Path] | None = None,
+) -> Tuple[List[Path], Dict[Path, Path]]:
+    """
+    Compute the include roots to pass to protoc so that every import of
+    every file resolves, for trees with several roots side by side (e.g.
+    internal protos next to vendored googleapis and third-party roots).
+
+    The include roots are the files' own roots, then a minimal set of
+    extra roots, chosen greedily, for the imports that neither
+    include_paths nor those roots provide. Imports resolvable nowhere are
+    left to protoc to report. A file imported under another root than the
+    one find_proto_root guessed (e.g. a vendored file without imports) is
+    moved to that root, so it is compiled under the name it is imported by.
+
+    Results are cached per tree, keyed by the files and their mtimes.
+
+    Args:
+        roots: .proto file -> its proto root, e.g. from find_proto_roots.
+        include_paths: Include paths always passed to protoc.
+        search_files: .proto files that may serve imports; defaults to the
+                      files of roots.
+
+    Returns:
+        The include roots, and roots with the moved files updated.
+    """
+    key = tuple(sorted(
+        (str(path), str(root), os.stat(path).st_mtime_ns) for path, root in roots.items()
+    ))
+    files = roots if search_files is None else search_files
+    search = tuple(sorted(str(Path(f)) for f in files))
+    include_roots, rerooted = _include_roots(
+        key, tuple(str(inc) for inc in include_paths), search
+    )
+    fixed = dict(roots)
+    fixed.update((Path(path), Path(root)) for path, root in rerooted)
+    return [Path(root) for root in include_roots], fixed
@@ -0,0 +1,171 @@
+"""
+Module for the import dependency graph of a proto tree, persisted next to
+the generated files so later compiles only redo the files a change affects.
+"""
+import hashlib
+import os
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Set
+
+from .proto_cache import _FORMAT, _read, _write
+from .proto_compile_cache import output_names, protoc_version
+from .proto_finder import _extract_imports
+
+# Graph state of the last successful compile, inside the output directory
+STATE_FILE = ".proto_explorer_graph.bin"
+
+
+class ImportGraph:
+    """
+    Forward and reverse import edges between the files of a proto tree.
+    Imports that resolve outside the tree (e.g. well-known types) have no
+    edge.
+
+    Attributes:
+        forward: File -> files it imports.
+        reverse: File -> files importing it.
+    """
+
+    def __init__(self, forward: Dict[Path, List[Path]]):
+        self.forward = forward
+        self.reverse: Dict[Path, List[Path]] = {path: [] for path in forward}
+        for path, deps in forward.items():
+            for dep in deps:
+                self.reverse.setdefault(dep, []).append(path)
+
+    def dependents(self, files: Iterable[Path]) -> Set[Path]:
+        """The given files plus everything importing them, transitively."""
+        closure: Set[Path] = set()
+        stack = list(files)
+        while stack:
+            path = stack.pop()
+            if path in closure:
+                continue
+            closure.add(path)
+            stack.extend(self.reverse.get(path, ()))
+        return closure
+
+    def topological_order(self, files: Iterable[Path]) -> List[Path]:
+        """
+        Order files so each one comes after the files it imports. Files in
+        an import cycle (which protoc rejects anyway) come last.
+        """
+        subset = set(files)
+        pending = {
+            path: sum(1 for dep in self.forward.get(path, ()) if dep in subset)
+            for path in subset
+        }
+        ready = sorted(path for path, count in pending.items() if count == 0)
+        order = []
+        while ready:
+            path = ready.pop()
+            order.append(path)
+            del pending[path]
+            for user in self.reverse.get(path, ()):
+                if user in pending:
+                    pending[user] -= 1
+                    if pending[user] == 0:
+                        ready.append(user)
+        return order + sorted(pending)
+
+
+def _resolve(imp: str, search: Sequence[Path], tree: Dict[Path, Path]) -> Optional[Path]:
+    """Resolve an import like protoc does; None if it is not a tree file."""
+    for inc in search:
+        candidate = inc / imp
+        if candidate in tree:
+            return candidate
+        if candidate.is_file():
+            return None
+    return None
+
+
+def _sha256_file(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+class RebuildPlan(NamedTuple):
+    """Files to recompile, and the tree state to save once they compiled."""
+    files: List[Path]
+    graph: ImportGraph
+    state: tuple
+    # Outputs (relative to the output directory) of deleted .proto files
+    stale: List[Path]
+
+
+def plan_rebuild(
+        output_dir: Path,
+        roots: Dict[Path, Path],
+        include_paths: Sequence[Path],
+) -> RebuildPlan:
+    """
+    Compare a tree with the state saved by the last compile into output_dir.
+
+    A file is dirty when it is new, its content or proto root changed, or
+    its outputs are missing. Dirty and deleted files invalidate everything
+    importing them. Files whose (mtime, size) did not change are not read.
+
+    Args:
+        output_dir: Output directory of the previous compile.
+        roots: Every .proto file of the tree -> its proto root.
+        include_paths: Extra include paths passed to protoc.
+
+    Returns:
+        The plan; its files are in topological order (imports first).
+    """
+    config = f"{protoc_version()}\0" + "\0".join(str(inc) for inc in include_paths)
+    previous = _read(output_dir / STATE_FILE)
+    old: Dict[str, tuple] = {}
+    if previous is not None and previous[1] == config:
+        old = {entry[0]: entry for entry in previous[2]}
+
+    entries = []
+    imports: Dict[Path, List[str]] = {}
+    dirty: Set[Path] = set()
+    for path, proto_root in roots.items():
+        st = os.stat(path)
+        entry = old.get(str(path))
+        if entry and entry[1] == str(proto_root) and entry[2:4] == (st.st_mtime_ns, st.st_size):
+            digest, file_imports = entry[4], list(entry[5])
+        else:
+            digest = _sha256_file(path)
+            if entry and entry[1] == str(proto_root) and entry[4] == digest:
+                file_imports = list(entry[5])
+            else:
+                file_imports = _extract_imports(path)
+                dirty.add(path)
+        if path not in dirty and not all(
+            (output_dir / rel).exists() for rel in output_names(path, proto_root)
+        ):
+            dirty.add(path)
+        imports[path] = file_imports
+        entries.append((str(path), str(proto_root), st.st_mtime_ns, st.st_size,
+                        digest, tuple(file_imports)))
+
+    forward = {}
+    for path, file_imports in imports.items():
+        search = [roots[path], *(inc for inc in include_paths if inc != roots[path])]
+        forward[path] = [
+            dep for dep in (_resolve(imp, search, roots) for imp in file_imports)
+            if dep is not None
+        ]
+    graph = ImportGraph(forward)
+
+    # A deleted file leaves its importers with a dangling import: rebuild
+    # them too, so the error surfaces instead of stale outputs staying around
+    deleted = {Path(name) for name in old} - set(roots)
+    stale = []
+    for name in deleted:
+        stale += output_names(name, Path(old[str(name)][1]))
+        for path, file_imports in imports.items():
+            if any(roots[path] / imp == name for imp in file_imports):
+                dirty.add(path)
+
+    closure = graph.dependents(dirty) & set(roots)
+    state = (_FORMAT, config, tuple(entries))
+    return RebuildPlan(graph.topological_order(closure), graph, state, stale)
+
+
+def save_state(output_dir: Path, plan: RebuildPlan):
+    """Record the tree state once the planned files compiled successfully."""
+    _write(output_dir / STATE_FILE, plan.state)
@@ -0,0 +1,224 @@
+"""
+Module to index every message, enum and service of a compiled schema by
+full name, walking the file descriptors rather than module attributes.
+"""
+import functools
+import os
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from google.protobuf import descriptor_pb2, descriptor_pool
+from google.protobuf.descriptor import (
+    Descriptor,
+    EnumDescriptor,
+    FileDescriptor,
+    ServiceDescriptor,
+)
+
+AnyDescriptor = Union[Descriptor, EnumDescriptor, ServiceDescriptor]
+
+
+def iter_messages(file_desc: FileDescriptor) -> Iterator[Descriptor]:
+    """Yield the messages of a file, each followed by its nested types."""
+    stack = list(reversed(file_desc.message_types_by_name.values()))
+    while stack:
+        msg = stack.pop()
+        yield msg
+        stack.extend(reversed(msg.nested_types))
+
+
+class SchemaIndex:
+    """
+    Full-name index over a set of .proto files and their transitive imports.
+
+    Attributes:
+        files: File name -> FileDescriptor, for every indexed file.
+        messages: Full name -> Descriptor, including nested and map entry types.
+        enums: Full name -> EnumDescriptor, including nested enums.
+        services: Full name -> ServiceDescriptor.
+        root_files: Names of the files the index was built from, i.e. not
+                    reached only through imports.
+        local_messages: Full names of the (non map entry) messages declared
+                        in the root files, in declaration order, each one
+                        followed by its nested types.
+    """
+
+    def __init__(self):
+        self.files: Dict[str, FileDescriptor] = {}
+        self.messages: Dict[str, Descriptor] = {}
+        self.enums: Dict[str, EnumDescriptor] = {}
+        self.services: Dict[str, ServiceDescriptor] = {}
+        self.root_files: List[str] = []
+        self.local_messages: List[str] = []
+
+    def lookup(self, full_name: str) -> Optional[AnyDescriptor]:
+        """Return the message, enum or service with this full name, if any."""
+        return (
+            self.messages.get(full_name)
+            or self.enums.get(full_name)
+            or self.services.get(full_name)
+        )
+
+    def add_file(self, file_desc: FileDescriptor, root: bool = True):
+        """
+        Index a file descriptor and, transitively, everything it imports.
+        """
+        if root and file_desc.name not in self.root_files:
+            self.root_files.append(file_desc.name)
+            self.local_messages.extend(
+                msg.full_name for msg in iter_messages(file_desc)
+                if not msg.GetOptions().map_entry
+            )
+        stack = [file_desc]
+        while stack:
+            fd = stack.pop()
+            if fd.name in self.files:
+                continue
+            self.files[fd.name] = fd
+            for msg in iter_messages(fd):
+                # Map entries are indexed for lookups but never listed
+                self.messages[msg.full_name] = msg
+                for enum in msg.enum_types:
+                    self.enums[enum.full_name] = enum
+            for enum in fd.enum_types_by_name.values():
+                self.enums[enum.full_name] = enum
+            for service in fd.services_by_name.values():
+                self.services[service.full_name] = service
+            stack.extend(fd.dependencies)
+
+
+def build_schema_index(file_descriptors: Iterable[FileDescriptor]) -> SchemaIndex:
+    """
+    Build one index over the given files and their transitive imports.
+    """
+    index = SchemaIndex()
+    for file_desc in file_descriptors:
+        index.add_file(file_desc)
+    return index
+
+
+def _build_module_index(module) -> SchemaIndex:
+    file_desc = getattr(module, "DESCRIPTOR", None)
+    if not isinstance(file_desc, FileDescriptor):
+        raise AttributeError(f"Module '{module.__name__}' has no file DESCRIPTOR")
+    return build_schema_index([file_desc])
+
+
+_cached_module_index = functools.lru_cache(maxsize=None)(_build_module_index)
+
+
+def index_module(module, cache: bool = True) -> SchemaIndex:
+    """
+    Index a compiled _pb2 module through its DESCRIPTOR (cached per module
+    unless cache is False).
+
+    Raises:
+        AttributeError if the module has no file DESCRIPTOR.
+    """
+    return _cached_module_index(module) if cache else _build_module_index(module)
+
+
+def pool_from_descriptor_set(data: bytes) -> tuple[descriptor_pool.DescriptorPool, List[str]]:
+    """
+    Load a serialized FileDescriptorSet into a new, private DescriptorPool.
+
+    Files are added dependencies first. Imports missing from the set are
+    taken from the default pool when it has them (e.g. well-known types),
+    so sets generated without --include_imports still load when possible.
+
+    Returns:
+        The pool and the names of the "root" files of the set, i.e. those
+        not imported by any other file in it.
+
+    Raises:
+        ValueError if the data is not a FileDescriptorSet or an import
+        cannot be resolved.
+    """
+    try:
+        file_set = descriptor_pb2.FileDescriptorSet.FromString(data)
+    except Exception as e:
+        raise ValueError(f"Not a serialized FileDescriptorSet: {e}") from e
+
+    protos = {fp.name: fp for fp in file_set.file}
+    pool = descriptor_pool.DescriptorPool()
+    added = set()
+
+    def add(name: str):
+        # Iterative post-order DFS so deep import chains cannot overflow
+        stack = [(name, False)]
+        while stack:
+            current, deps_done = stack.pop()
+            if current in added:
+                continue
+            if deps_done:
+                if current in protos:
+                    pool.AddSerializedFile(protos[current].SerializeToString())
+                else:
+                    try:
+                        fd = descriptor_pool.Default().FindFileByName(current)
+                    except KeyError as e:
+                        raise ValueError(
+                            f"Import '{current}' is missing from the descriptor set; "
+                            f"generate it with protoc --include_imports"
+                        ) from e
+                    pool.AddSerializedFile(fd.serialized_pb)
+                added.add(current)
+                continue
+            stack.append((current, True))
+            deps = protos[current].dependency if current in protos else ()
+            stack.extend((dep, False) for dep in reversed(deps) if dep not in added)
+
+    for name in protos:
+        add(name)
+
+    imported = {dep for fp in file_set.file for dep in fp.dependency}
+    roots = [fp.name for fp in file_set.file if fp.name not in imported]
+    return pool, roots or list(protos)
+
+
+# (path, root files) -> (mtime_ns, size, index) of the last index built
+# from that path
+_SET_INDEXES: Dict[tuple, Tuple[int, int, SchemaIndex]] = {}
+
+
+def _build_descriptor_set_index(path: str, root_files: Optional[tuple]) -> SchemaIndex:
+    pool, roots = pool_from_descriptor_set(Path(path).read_bytes())
+    files = []
+    for name in root_files or roots:
+        try:
+            files.append(pool.FindFileByName(name))
+        except KeyError as e:
+            raise ValueError(f"'{name}' is not in the descriptor set {path}") from e
+    return build_schema_index(files)
+
+
+def index_descriptor_set(
+        path: str | Path,
+        cache: bool = True,
+        root_files: Optional[Iterable[str]] = None,
+) -> SchemaIndex:
+    """
+    Index a FileDescriptorSet file (e.g. from `protoc --descriptor_set_out
+    --include_imports`) without importing any generated Python code.
+
+    The index's root files are root_files when given (e.g. the files a
+    set was compiled from), else those no other file of the set imports.
+
+    Cached per file path; when the file changes, its new index replaces
+    the old one. With cache=False the index (and its DescriptorPool) is
+    built afresh and not kept.
+
+    Raises:
+        ValueError if a root file is not in the set.
+    """
+    path = os.path.abspath(path)
+    root_files = tuple(root_files) if root_files else None
+    if not cache:
+        return _build_descriptor_set_index(path, root_files)
+    stat = os.stat(path)
+    cached = _SET_INDEXES.get((path, root_files))
+    if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+        return cached[2]
+    index = _build_descriptor_set_index(path, root_files)
+    _SET_INDEXES[(path, root_files)] = (stat.st_mtime_ns, stat.st_size, index)
+    return index
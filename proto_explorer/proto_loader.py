@@ -0,0 +1,217 @@
+"""
+Module for argument parsing and _pb2 module loading shared by the CLI and
+the Streamlit apps. Must not import Streamlit.
+"""
+import argparse
+import functools
+import importlib
+import importlib.util
+import os
+import sys
+
+
+def validate_proto_module(module_name: str):
+    """
+    Try to import the target _pb2 module and catch dependency errors.
+    """
+    try:
+        __import__(module_name)
+        return True
+    except ModuleNotFoundError as e:
+        missing = e.name
+        raise ImportError(
+            f"Failed to import '{module_name}'. Missing dependency: '{missing}'. "
+            f"This usually means the package isn't installed or _pb2 has bad imports."
+        ) from e
+    except Exception as e:
+        raise ImportError(f"Error importing '{module_name}': {e}") from e
+
+
+def add_module_args(parser: argparse.ArgumentParser, required: bool = True):
+    """
+    Add the schema source options (--proto_module or --descriptor_set,
+    plus --load_path) to a parser.
+    """
+    parser.add_argument(
+        "--load_path",
+        "-p",
+        help="Path to directory containing _pb2.py files (will added to runtime sys.path).",
+        required=False,
+    )
+    source = parser.add_mutually_exclusive_group(required=required)
+    source.add_argument(
+        "--proto_module",
+        "-m",
+        help="Python module name of the _pb2 file to load, e.g. myproject.datamanager.users_pb2.",
+    )
+    source.add_argument(
+        "--descriptor_set",
+        "--descriptor-set",
+        "-d",
+        help="Serialized FileDescriptorSet to load instead of a _pb2 module, "
+             "e.g. from protoc --descriptor_set_out=out.pb --include_imports.",
+    )
+
+
+def schema_label(args: argparse.Namespace) -> str:
+    """
+    Short name of the schema source, for titles and file names.
+    """
+    if getattr(args, "descriptor_set", None):
+        return os.path.basename(args.descriptor_set)
+    return args.proto_module
+
+
+def resolve_module_args(args: argparse.Namespace) -> argparse.Namespace:
+    """
+    Validate --load_path and --proto_module, making the module importable,
+    or check that --descriptor_set or the .proto paths exist.
+
+    Raises:
+        ValueError if the path is not a directory or the module is not found.
+        ImportError if the module fails to import.
+    """
+    for path in getattr(args, "proto_paths", None) or ():
+        if not (os.path.isdir(path) or (os.path.isfile(path) and path.endswith(".proto"))):
+            raise ValueError(f"'{path}' is not a .proto file or a directory")
+    if getattr(args, "proto_paths", None):
+        args.proto_paths = [os.path.abspath(path) for path in args.proto_paths]
+        return args
+
+    # Catalog modules are imported lazily, on first access in the app
+    if getattr(args, "catalog", None):
+        args.catalog = [
+            os.path.abspath(entry) if os.path.exists(entry) else entry
+            for entry in args.catalog
+        ]
+        if args.load_path:
+            args.load_path = os.path.abspath(args.load_path)
+        return args
+
+    # The launcher already validated the source and built the schema
+    if getattr(args, "snapshot", None) and os.path.isfile(args.snapshot):
+        return args
+
+    if getattr(args, "descriptor_set", None):
+        if not os.path.isfile(args.descriptor_set):
+            raise ValueError(f"--descriptor_set '{args.descriptor_set}' is not a file")
+        args.descriptor_set = os.path.abspath(args.descriptor_set)
+        return args
+
+    # Validate --load_path
+    if args.load_path:
+        abs_path = os.path.abspath(args.load_path)
+        if not os.path.isdir(abs_path):
+            raise ValueError(f"--load_path '{args.load_path}' is not a valid directory")
+        if abs_path not in sys.path:
+            sys.path.insert(0, abs_path)
+
+    # Validate --module import
+    spec = importlib.util.find_spec(args.proto_module)
+    if spec is None:
+        raise ValueError(
+            f"Cannot import module '{args.proto_module}'. "
+            f"Ensure it exists and check --load_path"
+        )
+
+    validate_proto_module(args.proto_module)
+
+    return args
+
+
+def parse_args(
+        argv: list[str] | None = None,
+        resolve: bool = True,
+) -> argparse.Namespace:
+    """
+    Parse and validate the explorer's command line arguments.
+
+    With resolve=False the module is neither looked up nor imported; call
+    resolve_module_args on the result for that.
+    """
+    parser = argparse.ArgumentParser(
+        description="Interactive viewer for gRPC .proto hierarchies."
+    )
+    parser.add_argument(
+        "proto_paths",
+        nargs="*",
+        metavar="PROTO",
+        help=".proto files or directories to compile and explore, "
+             "instead of --proto_module or --descriptor_set.",
+    )
+    add_module_args(parser, required=False)
+    parser.add_argument(
+        "--port",
+        type=int,
+        default=0,
+        help="Port to serve the app on (default: any free port).",
+    )
+    parser.add_argument(
+        "--catalog",
+        nargs="+",
+        metavar="SOURCE",
+        help="Serve several schemas from one process: _pb2 module names (see "
+             "--load_path), descriptor set files, or directories holding them. "
+             "Users pick one in the app or with the ?schema= URL parameter.",
+    )
+    parser.add_argument(
+        "--max-memory-mb",
+        type=float,
+        help="With --catalog, memory budget of the loaded schemas; the least "
+             "recently used ones are dropped beyond it (default: 512, or "
+             "$PROTO_EXPLORER_MAX_MEMORY_MB).",
+    )
+    parser.add_argument(
+        "--profile-startup",
+        action="store_true",
+        help="Report the wall time of each startup phase and an import-time tree.",
+    )
+    parser.add_argument(
+        "--profile-json",
+        metavar="FILE",
+        help="Also write the startup profile as JSON to FILE ('-' prints "
+             "only the JSON); implies --profile-startup.",
+    )
+    # Schema prebuilt by the launcher for the app (see proto_cache.write_snapshot)
+    parser.add_argument("--snapshot", help=argparse.SUPPRESS)
+    # Files of --descriptor_set to list, set by the launcher for the PROTO it
+    # compiled (see proto_index.index_descriptor_set)
+    parser.add_argument("--root_file", action="append", help=argparse.SUPPRESS)
+    # File the app writes its startup phases to (see proto_profile.write_phases)
+    parser.add_argument("--profile-out", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.profile_json:
+        args.profile_startup = True
+    sources = [args.proto_paths, args.proto_module, args.descriptor_set, args.catalog]
+    if sum(1 for source in sources if source) > 1:
+        parser.error("use only one of PROTO, --proto_module, --descriptor_set and --catalog")
+    if not any(sources):
+        parser.error(
+            "one of the arguments PROTO --proto_module/-m --descriptor_set/-d --catalog is required"
+        )
+    return resolve_module_args(args) if resolve else args
+
+
+@functools.lru_cache(maxsize=None)
+def _parse_args_once(argv: tuple[str, ...]) -> argparse.Namespace:
+    return parse_args(list(argv))
+
+
+def app_args() -> argparse.Namespace:
+    """
+    parse_args for the Streamlit apps, resolved once per server process.
+
+    Streamlit reruns the app script on every widget interaction; this
+    module stays imported, so the module lookup and import validation are
+    not repeated. Treat the returned namespace as read-only.
+    """
+    return _parse_args_once(tuple(sys.argv[1:]))
+
+
+def import_proto_module(module_name: str, search_path: str | None = None):
+    """Import a compiled _pb2 module dynamically, optionally from a custom path."""
+    if search_path:
+        abs_path = os.path.abspath(search_path)
+        if abs_path not in sys.path:
+            sys.path.insert(0, abs_path)
+    return importlib.import_module(module_name)
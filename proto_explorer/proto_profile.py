@@ -0,0 +1,197 @@
+"""
+Module for `proto-explorer --profile-startup`: wall time of each startup
+phase and a per-dependency import-time tree, as text and as JSON.
+
+The launcher records its own phases (argument parsing, module import,
+descriptor indexing, Streamlit readiness); the app records the phases of
+its process up to the first render and writes them to a file the launcher
+merges in. Must not import Streamlit.
+"""
+import contextlib
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional
+
+# Import-tree nodes shorter than this (cumulative) are left out of the text
+# report; the JSON report keeps them all
+_MIN_TREE_MS = 2.0
+
+# One line of `python -X importtime` output, e.g.
+# "import time:       391 |        837 |   google.protobuf"
+_IMPORTTIME_RE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)")
+
+
+class Phase(NamedTuple):
+    """Wall time of one startup phase, with optional free-form details."""
+    name: str
+    seconds: float
+    detail: Dict[str, Any]
+
+
+class ImportNode(NamedTuple):
+    """One module of an import-time tree; times are in milliseconds."""
+    module: str
+    self_ms: float
+    cumulative_ms: float
+    children: List["ImportNode"]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "module": self.module,
+            "self_ms": self.self_ms,
+            "cumulative_ms": self.cumulative_ms,
+            "children": [child.to_dict() for child in self.children],
+        }
+
+
+class StartupProfile:
+    """
+    Ordered list of timed phases, reported as text or JSON.
+
+    Phases are timed whether or not profiling was requested (timing costs
+    next to nothing); callers only report them when it was.
+    """
+
+    def __init__(self):
+        self.phases: List[Phase] = []
+        self.import_tree: List[ImportNode] = []
+
+    def add(self, name: str, seconds: float, **detail):
+        self.phases.append(Phase(name, seconds, detail))
+
+    @contextlib.contextmanager
+    def phase(self, name: str, **detail) -> Iterator[Dict[str, Any]]:
+        """Time the block as one phase; the yielded dict collects details."""
+        start = time.perf_counter()
+        try:
+            yield detail
+        finally:
+            self.add(name, time.perf_counter() - start, **detail)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "total_seconds": sum(p.seconds for p in self.phases),
+            "phases": [
+                {"name": p.name, "seconds": p.seconds, **p.detail}
+                for p in self.phases
+            ],
+            "import_tree": [node.to_dict() for node in self.import_tree],
+        }
+
+    def format_text(self, min_tree_ms: float = _MIN_TREE_MS) -> str:
+        width = max((len(p.name) for p in self.phases), default=0)
+        lines = ["Startup profile (wall time):"]
+        for p in self.phases:
+            detail = ", ".join(f"{k}={v}" for k, v in p.detail.items() if v is not None)
+            line = f"  {p.name:<{width}}  {p.seconds * 1000:9.1f} ms"
+            lines.append(f"{line}  ({detail})" if detail else line)
+        total = sum(p.seconds for p in self.phases)
+        lines.append(f"  {'total':<{width}}  {total * 1000:9.1f} ms")
+        if self.import_tree:
+            lines.append("")
+            lines.append(
+                f"Import time, fresh interpreter (cumulative / self, >= {min_tree_ms:g} ms):"
+            )
+            for node in self.import_tree:
+                lines.extend(_tree_lines(node, 1, min_tree_ms))
+        return "\n".join(lines)
+
+
+def _tree_lines(node: ImportNode, depth: int, min_ms: float) -> Iterator[str]:
+    if node.cumulative_ms < min_ms:
+        return
+    yield (
+        f"{'  ' * depth}{node.module}  "
+        f"{node.cumulative_ms:.1f} / {node.self_ms:.1f} ms"
+    )
+    for child in sorted(node.children, key=lambda c: -c.cumulative_ms):
+        yield from _tree_lines(child, depth + 1, min_ms)
+
+
+def parse_importtime(output: str) -> List[ImportNode]:
+    """
+    Build the import tree from `python -X importtime` output.
+
+    Lines come in post-order: a module is printed after everything it
+    imported, indented one level deeper than itself.
+    """
+    pending: List[tuple] = []  # (depth, node)
+    for match in _IMPORTTIME_RE.finditer(output):
+        self_us, cumulative_us, indent, module = match.groups()
+        depth = len(indent) // 2
+        children = []
+        while pending and pending[-1][0] > depth:
+            children.append(pending.pop()[1])
+        children.reverse()
+        node = ImportNode(module, int(self_us) / 1000, int(cumulative_us) / 1000, children)
+        pending.append((depth, node))
+    return [node for _, node in pending]
+
+
+def import_time_tree(
+        modules: List[str],
+        load_path: Optional[str] = None,
+        timeout: float = 120.0,
+) -> List[ImportNode]:
+    """
+    Import modules in a fresh interpreter with -X importtime and return
+    one tree per top-level import; modules that fail to import are
+    skipped. Returns [] if the interpreter cannot run.
+    """
+    env = dict(os.environ)
+    if load_path:
+        env["PYTHONPATH"] = os.pathsep.join(
+            p for p in (os.path.abspath(load_path), env.get("PYTHONPATH")) if p
+        )
+    # A module failing to import (e.g. Streamlit missing) must not hide the rest
+    code = "".join(
+        f"try:\n    import {module}\nexcept Exception:\n    pass\n" for module in modules
+    )
+    try:
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", code],
+            env=env,
+            capture_output=True,
+            text=True,
+            timeout=timeout,
+            check=False,
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        return []
+    return parse_importtime(proc.stderr)
+
+
+def write_phases(path: str, profile: StartupProfile):
+    """Write the phases of a profile for another process to read_phases."""
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump([list(p) for p in profile.phases], f)
+    os.replace(tmp, path)
+
+
+def read_phases(path: str) -> Optional[List[Phase]]:
+    """Phases written by write_phases, or None if the file is not there yet."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            return [Phase(*p) for p in json.load(f)]
+    except (OSError, ValueError, TypeError):
+        return None
+
+
+def report(profile: StartupProfile, json_path: Optional[str] = None):
+    """
+    Print the text report, and write the JSON one to json_path if given
+    ("-" prints the JSON to stdout instead of the text).
+    """
+    if json_path == "-":
+        print(json.dumps(profile.to_dict(), indent=2), flush=True)
+        return
+    print(profile.format_text(), flush=True)
+    if json_path:
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(profile.to_dict(), f, indent=2)
+        print(f"Startup profile written to {json_path}", flush=True)
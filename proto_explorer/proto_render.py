@@ -0,0 +1,62 @@
+"""
+Module to pre-build the text of whole field lists, so a view can emit one
+element per message instead of one element per field.
+"""
+import html
+from re import Pattern
+from typing import FrozenSet, Iterable, List
+
+from .proto_schema import FieldRow
+
+
+def highlight(text: str, regex: Pattern | None = None) -> str:
+    """
+    HTML-escape text and wrap every regex match in <mark> tags.
+
+    Matching runs on the raw text, so patterns containing '<' or '&' still
+    hit type names such as 'map<STRING, pkg.Value>'.
+    """
+    if not regex:
+        return html.escape(text, quote=False)
+    parts = []
+    pos = 0
+    for m in regex.finditer(text):
+        if m.start() == m.end():
+            continue
+        parts.append(html.escape(text[pos:m.start()], quote=False))
+        parts.append(f"<mark>{html.escape(m.group(), quote=False)}</mark>")
+        pos = m.end()
+    parts.append(html.escape(text[pos:], quote=False))
+    return "".join(parts)
+
+
+def visible_rows(
+        rows: Iterable[FieldRow],
+        regex: Pattern | None = None,
+        matches: FrozenSet[str] | None = None,
+        filter_mode: bool = False,
+) -> List[FieldRow]:
+    """
+    Return the rows a search view should show.
+
+    In filter mode, message fields are dropped unless the field itself or
+    something below it matches the regex.
+    """
+    if not (regex and filter_mode):
+        return list(rows)
+    return [
+        row for row in rows
+        if not row.child
+        or row.child in matches
+        or regex.search(f"- {row.text}")
+    ]
+
+
+def field_block(rows: Iterable[FieldRow], regex: Pattern | None = None) -> str:
+    """
+    Build one markdown list covering all given rows, highlighting applied.
+
+    The result contains HTML (escaped text and <mark> tags), so it must be
+    rendered with unsafe_allow_html=True.
+    """
+    return "\n".join(f"- {highlight(row.text, regex)}" for row in rows)
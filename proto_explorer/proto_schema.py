@@ -0,0 +1,198 @@
+"""
+Module for the precomputed field-row model shared by the explorer views.
+
+Descriptor introspection (map detection, key/value type resolution, type
+name lookups) happens once per message here; renderers only read the rows.
+"""
+import inspect
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from google.protobuf.descriptor import Descriptor, FieldDescriptor
+
+from .proto_index import index_descriptor_set, index_module
+from .proto_loader import import_proto_module
+
+# A mapping from protobuf field type integer values to their corresponding
+# string names. Created by inverting the FieldDescriptor.TYPE_* constants.
+# No official constant table is exported by the protobuf package for numeric
+# type IDs, so here we generate it dynamically from the library itself.
+# Expected contents: {
+# 1: "DOUBLE", 2: "FLOAT", 3: "INT64", 4: "UINT64", 5: "INT32", 6: "FIXED64",
+# 7: "FIXED32", 8: "BOOL", 9: "STRING", 11: "MESSAGE", 12: "BYTES",
+# 13: "UINT32", 14: "ENUM", 15: "SFIXED32", 16: "SFIXED64", 17: "SINT32",
+# 18: "SINT64",
+# }
+TYPE_NAMES: Dict[int, str] = {
+    v: k.replace("TYPE_", "")
+    for k, v in FieldDescriptor.__dict__.items()
+    if k.startswith("TYPE_")
+}
+
+
+class FieldRow(NamedTuple):
+    """One field of a message, with everything a renderer needs resolved."""
+    name: str
+    number: int
+    label: str              # "optional", "required" or "repeated"
+    type_name: str          # e.g. "INT32", "pkg.Msg", "map<STRING, pkg.Val>"
+    is_map: bool
+    is_repeated: bool
+    oneof: Optional[str]    # name of the containing oneof, if any
+    child: Optional[str]    # full name of the nested message to expand into
+
+    @property
+    def text(self) -> str:
+        """Display text, e.g. 'tags: STRING [repeated]'."""
+        if self.is_repeated and not self.is_map:
+            return f"{self.name}: {self.type_name} [repeated]"
+        return f"{self.name}: {self.type_name}"
+
+
+# full_name -> field rows of that message, in declaration order
+RowModel = Dict[str, Tuple[FieldRow, ...]]
+
+
+def list_message_types(module, cache_index: bool = True) -> Dict[str, Descriptor]:
+    """
+    Return all message types declared in a _pb2 module, nested ones included.
+
+    Uses the index of the module's file DESCRIPTOR (cached unless
+    cache_index is False); modules without one fall back to scanning
+    module-level Descriptor attributes.
+    """
+    try:
+        index = index_module(module, cache_index)
+    except AttributeError:
+        messages = {}
+        for _, obj in inspect.getmembers(module):
+            if isinstance(obj, Descriptor):
+                messages[obj.full_name] = obj
+        return messages
+    return {name: index.messages[name] for name in index.local_messages}
+
+
+def _type_name(field: FieldDescriptor) -> str:
+    """Resolve the readable type name of a field."""
+    if field.type == FieldDescriptor.TYPE_ENUM and field.enum_type:
+        return field.enum_type.full_name
+    if field.type != FieldDescriptor.TYPE_MESSAGE or not field.message_type:
+        return TYPE_NAMES.get(field.type, str(field.type))
+    if not field.message_type.GetOptions().map_entry:
+        return field.message_type.full_name
+
+    # Map fields are synthetic message types with 'key' and 'value'
+    key_type = TYPE_NAMES.get(
+        field.message_type.fields_by_name["key"].type, "UNKNOWN"
+    )
+    value_field = field.message_type.fields_by_name["value"]
+    if value_field.type == FieldDescriptor.TYPE_MESSAGE and value_field.message_type:
+        value_type = value_field.message_type.full_name
+    elif value_field.type == FieldDescriptor.TYPE_ENUM and value_field.enum_type:
+        value_type = value_field.enum_type.full_name
+    else:
+        value_type = TYPE_NAMES.get(value_field.type, "UNKNOWN")
+    return f"map<{key_type}, {value_type}>"
+
+
+def message_rows(desc: Descriptor) -> Tuple[FieldRow, ...]:
+    """Build the field rows of a single message descriptor."""
+    rows = []
+    for field in desc.fields:
+        is_message = bool(
+            field.type == FieldDescriptor.TYPE_MESSAGE and field.message_type
+        )
+        is_map = is_message and field.message_type.GetOptions().map_entry
+        if field.is_repeated:
+            label = "repeated"
+        elif field.is_required:
+            label = "required"
+        else:
+            label = "optional"
+        rows.append(FieldRow(
+            name=field.name,
+            number=field.number,
+            label=label,
+            type_name=_type_name(field),
+            is_map=is_map,
+            is_repeated=field.is_repeated,
+            oneof=field.containing_oneof.name if field.containing_oneof else None,
+            child=field.message_type.full_name if is_message and not is_map else None,
+        ))
+    return tuple(rows)
+
+
+def build_row_model(roots: Iterable[Descriptor]) -> RowModel:
+    """
+    Build the rows of every message reachable from the given descriptors.
+
+    Args:
+        roots: Message descriptors to start from, e.g. the values returned
+               by list_message_types.
+
+    Returns:
+        Mapping of message full name to its field rows.
+    """
+    model: RowModel = {}
+    stack: List[Descriptor] = list(roots)
+    while stack:
+        desc = stack.pop()
+        if desc.full_name in model:
+            continue
+        model[desc.full_name] = message_rows(desc)
+        for field in desc.fields:
+            if (
+                field.type == FieldDescriptor.TYPE_MESSAGE
+                and field.message_type
+                and not field.message_type.GetOptions().map_entry
+            ):
+                stack.append(field.message_type)
+    return model
+
+
+def load_schema(
+        proto_module: Optional[str] = None,
+        load_path: Optional[str] = None,
+        descriptor_set: Optional[str] = None,
+        snapshot: Optional[str] = None,
+        cache_index: bool = True,
+        root_files: Optional[Iterable[str]] = None,
+) -> Tuple[List[str], RowModel]:
+    """
+    Load a schema from a _pb2 module or from a FileDescriptorSet file.
+
+    A descriptor set is read into a private DescriptorPool, so no generated
+    Python code is executed and sys.path is left untouched. Results go
+    through the on-disk cache of proto_cache when it is enabled.
+
+    A snapshot written by proto_cache.write_snapshot (e.g. by the launcher)
+    is used instead when it can be read.
+
+    root_files selects the files of a descriptor set whose messages are
+    listed (see proto_index.index_descriptor_set).
+
+    With cache_index=False the in-process indexes of proto_index are not
+    kept, so nothing but the returned rows outlives the call (apart from
+    the imported module, if any).
+
+    Returns:
+        The sorted names of the schema's own messages and the row model of
+        everything reachable from them.
+    """
+    # Imported here: proto_cache builds on this module
+    from .proto_cache import cached_schema, read_snapshot
+    if snapshot:
+        loaded = read_snapshot(snapshot)
+        if loaded is not None:
+            return loaded
+
+    cached = cached_schema(proto_module, load_path, descriptor_set, cache_index, root_files)
+    if cached is not None:
+        return cached
+
+    if descriptor_set:
+        index = index_descriptor_set(descriptor_set, cache_index, root_files)
+        messages = {name: index.messages[name] for name in index.local_messages}
+    else:
+        module = import_proto_module(proto_module, load_path)
+        messages = list_message_types(module, cache_index)
+    return sorted(messages.keys()), build_row_model(messages.values())
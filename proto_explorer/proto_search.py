@@ -0,0 +1,108 @@
+"""
+Module for regex search over the message graph of a proto schema.
+
+The graph is walked once per regex: cycles are collapsed into strongly
+connected components and "subtree contains a match" is propagated over the
+resulting DAG, so every node can be answered with a set lookup.
+"""
+from re import Pattern
+from typing import Dict, FrozenSet, List, Tuple
+
+from .proto_schema import RowModel
+
+# full_name -> (searchable texts, child message full names)
+MessageGraph = Dict[str, Tuple[Tuple[str, ...], Tuple[str, ...]]]
+
+
+def message_graph(rows: RowModel) -> MessageGraph:
+    """
+    Build the message graph of a row model.
+
+    The searchable texts of a message are its full name and the display text
+    of each of its fields (field name plus resolved type name). Children are
+    the nested messages its fields expand into.
+    """
+    graph: MessageGraph = {}
+    for full_name, field_rows in rows.items():
+        texts = (full_name,) + tuple(row.text for row in field_rows)
+        children = tuple(row.child for row in field_rows if row.child)
+        graph[full_name] = (texts, children)
+    return graph
+
+
+def _strongly_connected_components(graph: MessageGraph) -> List[List[str]]:
+    """
+    Iterative Tarjan's algorithm.
+
+    Components are returned in reverse topological order: every component
+    comes after all the components reachable from it.
+    """
+    index: Dict[str, int] = {}
+    lowlink: Dict[str, int] = {}
+    on_stack = set()
+    stack: List[str] = []
+    components: List[List[str]] = []
+
+    for start in graph:
+        if start in index:
+            continue
+        index[start] = lowlink[start] = len(index)
+        stack.append(start)
+        on_stack.add(start)
+        work = [(start, iter(graph[start][1]))]
+        while work:
+            node, children = work[-1]
+            advanced = False
+            for child in children:
+                if child not in graph:
+                    continue
+                if child not in index:
+                    index[child] = lowlink[child] = len(index)
+                    stack.append(child)
+                    on_stack.add(child)
+                    work.append((child, iter(graph[child][1])))
+                    advanced = True
+                    break
+                if child in on_stack:
+                    lowlink[node] = min(lowlink[node], index[child])
+            if advanced:
+                continue
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                lowlink[parent] = min(lowlink[parent], lowlink[node])
+            if lowlink[node] == index[node]:
+                component = []
+                while True:
+                    member = stack.pop()
+                    on_stack.discard(member)
+                    component.append(member)
+                    if member == node:
+                        break
+                components.append(component)
+    return components
+
+
+def build_match_index(graph: MessageGraph, regex: Pattern | None) -> FrozenSet[str]:
+    """
+    Return the full names of all messages whose subtree contains a match.
+
+    A message matches if the regex hits one of its own searchable texts, or
+    if any message reachable from it does. Messages on a cycle share the
+    same answer, so each strongly connected component is decided once.
+    """
+    if not regex:
+        return frozenset()
+
+    matched = set()
+    for component in _strongly_connected_components(graph):
+        # Children outside the component were decided earlier (reverse
+        # topological order); children inside it are decided together.
+        hit = any(
+            any(regex.search(text) for text in graph[node][0])
+            or any(child in matched for child in graph[node][1])
+            for node in component
+        )
+        if hit:
+            matched.update(component)
+    return frozenset(matched)
@@ -0,0 +1,197 @@
+"""
+Module for `proto-explorer compile-server`, a local daemon answering
+compile and describe requests over a Unix socket.
+
+The server process keeps grpc_tools loaded and the import, proto root and
+include root caches warm, so repeated requests from editors or pre-commit
+hooks skip interpreter startup and only redo the work a change requires.
+
+Protocol: one JSON object per line in each direction. Requests carry an
+"op" and an optional "id", echoed back in the response:
+
+  {"op": "compile", "path": "protos/", "out_dir": "gen/"}
+      Compile a tree (incrementally unless "incremental" is false, using
+      "jobs" processes) or a single .proto file into out_dir (required).
+  {"op": "describe", "paths": ["protos/foo.proto"], "message": "pkg.Foo"}
+      Compile in memory and list the messages, enums and services, or the
+      fields of "message" if given.
+  {"op": "ping"}, {"op": "shutdown"}
+
+Responses are {"ok": true, "ms": <elapsed>, ...} or {"ok": false, "error": ...}.
+Each connection is served by its own thread, so clients may keep theirs
+open; ops still run one at a time.
+"""
+import argparse
+import json
+import os
+import socket
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Dict
+
+from .proto_compiler import compile_proto, compile_tree, descriptor_set_file
+from .proto_index import index_descriptor_set
+from .proto_schema import message_rows
+
+
+def default_socket_path() -> str:
+    """Per-user socket path, under $XDG_RUNTIME_DIR when set."""
+    base = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    return os.path.join(base, f"proto-explorer-{os.getuid()}.sock")
+
+
+def _compile(request: Dict[str, Any]) -> Dict[str, Any]:
+    path = request["path"]
+    out_dir = request.get("out_dir")
+    if not out_dir:
+        # A directory made up here would be left behind by every request
+        raise ValueError("compile needs an out_dir")
+    if os.path.isfile(path):
+        output_dir = compile_proto(path, out_dir, search_dir=request.get("search_dir"))
+        return {"out_dir": str(output_dir), "files": 1}
+    output_dir, results = compile_tree(
+        path,
+        out_dir,
+        jobs=request.get("jobs", 1),
+        incremental=request.get("incremental", True),
+    )
+    return {
+        "out_dir": str(output_dir),
+        "files": sum(r.files for r in results),
+        "groups": [
+            {"proto_root": str(r.proto_root), "files": r.files, "seconds": r.seconds}
+            for r in results
+        ],
+    }
+
+
+def _describe(request: Dict[str, Any]) -> Dict[str, Any]:
+    set_path, names = descriptor_set_file(request["paths"])
+    # Not cached: every edit yields a new set path, whose pool would be kept
+    # for the life of the daemon
+    index = index_descriptor_set(set_path, cache=False, root_files=names)
+    message = request.get("message")
+    if message:
+        if message not in index.messages:
+            raise KeyError(f"Unknown message: {message}")
+        rows = message_rows(index.messages[message])
+        return {"message": message, "fields": [row._asdict() for row in rows]}
+    return {
+        "descriptor_set": str(set_path),
+        "files": list(index.files),
+        "messages": index.local_messages,
+        "enums": sorted(index.enums),
+        "services": sorted(index.services),
+    }
+
+
+_OPS = {"compile": _compile, "describe": _describe, "ping": lambda request: {}}
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    """Answer each request line of one connection in turn."""
+
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            start = time.perf_counter()
+            request: Dict[str, Any] = {}
+            try:
+                request = json.loads(line)
+                op = request.get("op")
+                if op == "shutdown":
+                    response = {"ok": True}
+                    threading.Thread(target=self.server.shutdown, daemon=True).start()
+                elif op in _OPS:
+                    with self.server.op_lock:
+                        response = {"ok": True, **_OPS[op](request)}
+                else:
+                    response = {"ok": False, "error": f"Unknown op: {op!r}"}
+            except Exception as e:
+                response = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+            response["ms"] = round((time.perf_counter() - start) * 1000, 2)
+            if "id" in request:
+                response["id"] = request["id"]
+            self.wfile.write(json.dumps(response).encode() + b"\n")
+            self.wfile.flush()
+
+
+class CompileServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    Unix socket server with a thread per connection, so an open connection
+    (e.g. an editor's) does not hold up other clients. Ops run one at a
+    time under op_lock, so protoc and the caches are never used
+    concurrently.
+    """
+
+    # Open connections must not keep the server from shutting down
+    daemon_threads = True
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.op_lock = threading.Lock()
+
+    def server_bind(self):
+        # Only the current user may connect
+        old_umask = os.umask(0o177)
+        try:
+            super().server_bind()
+        finally:
+            os.umask(old_umask)
+
+
+def _remove_stale_socket(path: str):
+    """
+    Remove a socket file left by a dead server.
+
+    Raises:
+        RuntimeError if a server is still listening on it.
+    """
+    if not os.path.exists(path):
+        return
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+        try:
+            probe.connect(path)
+        except OSError:
+            os.unlink(path)
+            return
+    raise RuntimeError(f"A compile server is already listening on {path}")
+
+
+def serve(socket_path: str):
+    """Run the compile server until it receives a shutdown request."""
+    _remove_stale_socket(socket_path)
+    with CompileServer(socket_path, _Handler) as server:
+        print(f"Compile server listening on {socket_path}", flush=True)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.unlink(socket_path)
+
+
+def main(argv: list[str] | None = None):
+    """
+    Entry point of `proto-explorer compile-server`.
+    """
+    parser = argparse.ArgumentParser(
+        prog="proto-explorer compile-server",
+        description="Serve compile and describe requests (JSON lines) on a Unix socket.",
+    )
+    parser.add_argument(
+        "--socket",
+        default=default_socket_path(),
+        help="Socket path (default: %(default)s).",
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        serve(args.socket)
+    except RuntimeError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,152 @@
+"""
+Module for a windowed tree-table over the field-row model.
+
+The tree is never flattened as a whole: subtree sizes are only computed for
+open nodes, so finding and producing the rows of one scroll window costs
+O(open nodes + window size) no matter how many rows the tree has.
+"""
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+from .proto_schema import RowModel
+
+# Path of a tree node: (top-level message full name, field name, field name, ...)
+NodePath = Tuple[str, ...]
+
+
+class TreeRow(NamedTuple):
+    """One visible line of the tree table."""
+    path: NodePath
+    depth: int
+    name: str               # message full name at the top level, else field name
+    type_name: str
+    number: Optional[int]
+    label: str
+    expandable: bool
+    expanded: bool
+
+
+class TreeTable:
+    """
+    Visible rows of the message hierarchy for a given set of open nodes.
+
+    Args:
+        roots: Top-level message full names, in display order.
+        rows: Field-row model covering every message reachable from roots.
+        expanded: Paths of the open nodes. Paths that do not resolve, or
+                  whose parent is closed, are ignored.
+    """
+
+    def __init__(self, roots: Sequence[str], rows: RowModel, expanded: Iterable[NodePath]):
+        self._roots = list(roots)
+        self._rows = rows
+        self._root_index = {name: i for i, name in enumerate(self._roots)}
+        self._field_index: Dict[str, Dict[str, int]] = {}
+        self._messages: Dict[NodePath, Optional[str]] = {}
+        self._sizes: Dict[NodePath, int] = {}
+
+        # parent path -> sorted indices of its open children
+        open_children: Dict[NodePath, Set[int]] = {}
+        for path in expanded:
+            if not path or self._message(path) is None:
+                continue
+            parent = path[:-1]
+            if parent:
+                index = self._fields(self._message(parent))[path[-1]]
+            else:
+                index = self._root_index[path[0]]
+            open_children.setdefault(parent, set()).add(index)
+        self._open = {parent: sorted(ids) for parent, ids in open_children.items()}
+
+    def _fields(self, message: str) -> Dict[str, int]:
+        """Field name -> row index for a message."""
+        if message not in self._field_index:
+            self._field_index[message] = {
+                row.name: i for i, row in enumerate(self._rows.get(message, ()))
+            }
+        return self._field_index[message]
+
+    def _message(self, path: NodePath) -> Optional[str]:
+        """Message a path expands into, or None if it is not expandable."""
+        if path in self._messages:
+            return self._messages[path]
+        if len(path) == 1:
+            message = path[0] if path[0] in self._root_index else None
+        else:
+            parent = self._message(path[:-1])
+            message = None
+            if parent is not None:
+                index = self._fields(parent).get(path[-1])
+                if index is not None:
+                    message = self._rows[parent][index].child
+        self._messages[path] = message
+        return message
+
+    def _child_count(self, path: NodePath) -> int:
+        if not path:
+            return len(self._roots)
+        return len(self._rows.get(self._message(path), ()))
+
+    def _row(self, path: NodePath, index: int, is_open: bool) -> TreeRow:
+        if not path:
+            name = self._roots[index]
+            return TreeRow(
+                path=(name,), depth=0, name=name, type_name="message",
+                number=None, label="", expandable=True, expanded=is_open,
+            )
+        row = self._rows[self._message(path)][index]
+        return TreeRow(
+            path=path + (row.name,), depth=len(path), name=row.name,
+            type_name=row.type_name, number=row.number, label=row.label,
+            expandable=row.child is not None, expanded=is_open,
+        )
+
+    def _subtree_size(self, path: NodePath) -> int:
+        """Number of visible rows below an open node (excluding itself)."""
+        if path not in self._sizes:
+            size = self._child_count(path)
+            for index in self._open.get(path, ()):
+                size += self._subtree_size(self._row(path, index, True).path)
+            self._sizes[path] = size
+        return self._sizes[path]
+
+    def __len__(self) -> int:
+        return self._subtree_size(())
+
+    def _iter(self, path: NodePath, skip: int) -> Iterator[TreeRow]:
+        """Yield the visible rows below path, starting `skip` rows in."""
+        opened = self._open.get(path, [])
+        i = 0
+        # Fast-forward over whole entries without visiting their subtrees.
+        for index in opened:
+            if skip < index - i:
+                break
+            skip -= index - i
+            i = index
+            span = 1 + self._subtree_size(self._row(path, index, True).path)
+            if skip < span:
+                break
+            skip -= span
+            i = index + 1
+        opened_set = set(opened)
+        if skip and i not in opened_set:
+            # Target lies in a run of collapsed entries.
+            i += skip
+            skip = 0
+
+        count = self._child_count(path)
+        while i < count:
+            is_open = i in opened_set
+            row = self._row(path, i, is_open)
+            if skip == 0:
+                yield row
+            else:
+                skip -= 1
+            if is_open:
+                yield from self._iter(row.path, skip)
+                skip = 0
+            i += 1
+
+    def window(self, start: int, count: int) -> List[TreeRow]:
+        """Return `count` visible rows starting at row `start`."""
+        return list(islice(self._iter((), max(start, 0)), count))
@@ -0,0 +1,27 @@
+"""
+Script the launcher hands to `streamlit run`.
+
+Streamlit executes it as a plain script, with this directory first on
+sys.path, where proto_explorer.py would shadow the package. It puts the
+package's parent first instead and runs the app from the package, so the
+app modules are imported like any other. Streamlit reruns this script on
+every interaction; the app modules stay imported in between.
+
+Set PROTO_EXPLORER_VIEW=plain for the view without search.
+"""
+import os
+import sys
+
+_PACKAGE_PARENT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if sys.path[0] != _PACKAGE_PARENT:
+    # Move rather than add, so reruns do not grow sys.path
+    if _PACKAGE_PARENT in sys.path:
+        sys.path.remove(_PACKAGE_PARENT)
+    sys.path.insert(0, _PACKAGE_PARENT)
+
+if os.environ.get("PROTO_EXPLORER_VIEW") == "plain":
+    from proto_explorer.proto_explorer import main as run
+else:
+    from proto_explorer.proto_explore_searcher import run
+
+run()
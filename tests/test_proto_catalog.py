@@ -0,0 +1,68 @@
+import sys
+
+import pytest
+from grpc_tools import protoc
+
+from proto_explorer import proto_index
+from proto_explorer.proto_catalog import SchemaLRU, discover_sources, load_source
+from proto_explorer.proto_compiler import compile_descriptor_set
+from proto_explorer.proto_schema import load_schema
+
+
+def _generate(out_dir, package, message):
+    out_dir.mkdir()
+    (out_dir / "api.proto").write_text(
+        f'syntax = "proto3";\npackage {package};\nmessage {message} {{}}\n'
+    )
+    assert protoc.main([
+        "grpc_tools.protoc", f"--proto_path={out_dir}", f"--python_out={out_dir}",
+        str(out_dir / "api.proto"),
+    ]) == 0
+
+
+def test_clashing_module_names_are_reported(tmp_path, monkeypatch):
+    monkeypatch.setenv("PROTO_EXPLORER_NO_CACHE", "1")
+    monkeypatch.setattr(sys, "path", list(sys.path))
+    monkeypatch.delitem(sys.modules, "api_pb2", raising=False)
+    _generate(tmp_path / "team_a", "a", "FromA")
+    _generate(tmp_path / "team_b", "b", "FromB")
+
+    sources = discover_sources([str(tmp_path / "team_a"), str(tmp_path / "team_b")])
+    assert list(sources) == ["api_pb2", "api_pb2 (2)"]
+
+    assert load_source(sources["api_pb2"])[0] == ["a.FromA"]
+    # The second directory's module would silently resolve to the first one
+    with pytest.raises(ImportError, match="outside"):
+        load_source(sources["api_pb2 (2)"])
+
+
+def test_load_path_does_not_pin_module_location(tmp_path, monkeypatch):
+    # -p only adds a directory to sys.path; the module may live elsewhere
+    monkeypatch.setenv("PROTO_EXPLORER_NO_CACHE", "1")
+    monkeypatch.setattr(sys, "path", list(sys.path))
+    monkeypatch.delitem(sys.modules, "api_pb2", raising=False)
+    _generate(tmp_path / "team_a", "a", "FromA")
+    (tmp_path / "deps").mkdir()
+    sys.path.append(str(tmp_path / "team_a"))
+
+    assert load_schema("api_pb2", str(tmp_path / "deps"))[0] == ["a.FromA"]
+
+
+def test_catalog_loads_keep_no_index(tmp_path, monkeypatch):
+    monkeypatch.setenv("PROTO_EXPLORER_NO_CACHE", "1")
+    paths = {}
+    for name in ("one", "two"):
+        proto = tmp_path / f"{name}.proto"
+        proto.write_text(f'syntax = "proto3";\npackage {name};\nmessage Msg {{}}\n')
+        paths[name] = tmp_path / f"{name}.pb"
+        paths[name].write_bytes(compile_descriptor_set([proto])[0])
+    cached = dict(proto_index._SET_INDEXES)
+
+    def load(name):
+        return load_schema(descriptor_set=str(paths[name]), cache_index=False)
+
+    schemas = SchemaLRU(load, max_bytes=1)
+    assert schemas.get("one")[0] == ["one.Msg"]
+    assert schemas.get("two")[0] == ["two.Msg"]
+    assert "one" not in schemas
+    assert proto_index._SET_INDEXES == cached
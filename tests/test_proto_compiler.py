@@ -0,0 +1,107 @@
+import tempfile
+
+from google.protobuf import descriptor_pb2
+
+from proto_explorer.proto_compiler import (
+    compile_descriptor_set,
+    compile_proto,
+    compile_tree,
+    descriptor_set_file,
+)
+from proto_explorer.proto_schema import load_schema
+
+
+def test_compile_descriptor_set_larger_than_pipe_buffer(tmp_path):
+    # Well over the 64 KB pipe buffer once compiled
+    messages = "".join(
+        f"message M{i} {{\n"
+        + "".join(f"  string field_with_long_name_{j} = {j + 1};\n" for j in range(10))
+        + "}\n"
+        for i in range(300)
+    )
+    proto = tmp_path / "big.proto"
+    proto.write_text(f'syntax = "proto3";\npackage big;\n{messages}')
+
+    data, names = compile_descriptor_set([proto])
+
+    assert len(data) > 64 * 1024
+    file_set = descriptor_pb2.FileDescriptorSet.FromString(data)
+    assert [f.name for f in file_set.file] == names
+    assert len(file_set.file[0].message_type) == 300
+
+
+def test_descriptor_set_file_lists_every_requested_file(tmp_path, monkeypatch):
+    monkeypatch.setenv("PROTO_EXPLORER_CACHE_DIR", str(tmp_path / "cache"))
+    common = tmp_path / "protos" / "acme" / "common"
+    api = tmp_path / "protos" / "acme" / "api"
+    ext = tmp_path / "vendor" / "ext"
+    standalone = tmp_path / "protos" / "acme" / "standalone"
+    for directory in (common, api, ext, standalone):
+        directory.mkdir(parents=True)
+    # No imports: its root is guessed as protos/acme, yet protoc names it
+    # after protos, the first include path holding it
+    (standalone / "x.proto").write_text(
+        'syntax = "proto3";\npackage standalone;\nmessage X {}\n'
+    )
+    (common / "tag.proto").write_text(
+        'syntax = "proto3";\npackage acme.common;\nmessage Tag {}\n'
+    )
+    (ext / "extra.proto").write_text('syntax = "proto3";\npackage ext;\nmessage Extra {}\n')
+    (api / "service.proto").write_text(
+        'syntax = "proto3";\npackage acme.api;\n'
+        'import "acme/common/tag.proto";\nimport "ext/extra.proto";\n'
+        "message Request {\n  acme.common.Tag tag = 1;\n  ext.Extra extra = 2;\n}\n"
+    )
+    paths = [tmp_path / "protos", tmp_path / "vendor"]
+
+    # Twice: compiled, then served from the compile cache
+    for _ in range(2):
+        set_path, names = descriptor_set_file(paths)
+        assert "acme/standalone/x.proto" in names
+        roots, rows = load_schema(descriptor_set=str(set_path), root_files=names)
+        assert roots == ["acme.api.Request", "acme.common.Tag", "ext.Extra", "standalone.X"]
+
+
+def _nested_roots_tree(tmp_path):
+    """
+    protos/acme/api/service.proto imports acme/common/tag.proto, next to a
+    file without imports whose root is guessed as protos/acme.
+    """
+    acme = tmp_path / "protos" / "acme"
+    for name in ("api", "common", "standalone"):
+        (acme / name).mkdir(parents=True)
+    (acme / "common" / "tag.proto").write_text(
+        'syntax = "proto3";\npackage acme.common;\nmessage Tag {}\n'
+    )
+    (acme / "api" / "service.proto").write_text(
+        'syntax = "proto3";\npackage acme.api;\nimport "acme/common/tag.proto";\n'
+        "message Request {\n  acme.common.Tag tag = 1;\n}\n"
+    )
+    (acme / "standalone" / "x.proto").write_text(
+        'syntax = "proto3";\npackage standalone;\nmessage X {}\n'
+    )
+    return tmp_path / "protos"
+
+
+def test_compile_tree_with_nested_roots(tmp_path, monkeypatch):
+    monkeypatch.setenv("PROTO_EXPLORER_NO_CACHE", "1")
+    out_dir, results = compile_tree(_nested_roots_tree(tmp_path), tmp_path / "gen")
+
+    assert sum(r.files for r in results) == 3
+    assert (out_dir / "acme" / "api" / "service_pb2.py").is_file()
+    assert (out_dir / "acme" / "common" / "tag_pb2.py").is_file()
+
+
+def test_compile_proto_leaves_no_temp_dirs(tmp_path, monkeypatch):
+    monkeypatch.setenv("PROTO_EXPLORER_NO_CACHE", "1")
+    monkeypatch.setenv("TMPDIR", str(tmp_path / "tmp"))
+    monkeypatch.setattr(tempfile, "tempdir", None)
+    (tmp_path / "tmp").mkdir()
+    proto = tmp_path / "protos" / "a.proto"
+    proto.parent.mkdir()
+    proto.write_text('syntax = "proto3";\nmessage A {}\n')
+
+    out_dir = compile_proto(proto, tmp_path / "gen")
+
+    assert list(out_dir.rglob("a_pb2.py"))
+    assert list((tmp_path / "tmp").iterdir()) == []
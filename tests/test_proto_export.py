@@ -0,0 +1,25 @@
+import subprocess
+import sys
+
+from proto_explorer.proto_export import main
+
+
+def test_export_html_default_name_keeps_dotted_module_name(tmp_path, monkeypatch):
+    package = tmp_path / "exportpkg"
+    package.mkdir()
+    (package / "users.proto").write_text(
+        'syntax = "proto3";\npackage exportpkg;\nmessage User {\n  string name = 1;\n}\n'
+    )
+    subprocess.run(
+        [sys.executable, "-m", "grpc_tools.protoc", f"-I{tmp_path}",
+         f"--python_out={tmp_path}", "exportpkg/users.proto"],
+        check=True,
+    )
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("PROTO_EXPLORER_NO_CACHE", "1")
+    monkeypatch.setattr(sys, "path", list(sys.path))
+
+    main(["-m", "exportpkg.users_pb2", "-p", str(tmp_path)])
+
+    assert (tmp_path / "exportpkg.users_pb2.html").is_file()
+    assert not (tmp_path / "exportpkg.html").exists()
@@ -0,0 +1,57 @@
+from proto_explorer.proto_finder import _scan_header, find_include_roots, find_proto_roots
+
+
+def test_find_include_roots_reroots_vendored_files(tmp_path):
+    money = tmp_path / "third_party" / "googleapis" / "google" / "type" / "money.proto"
+    price = tmp_path / "protos" / "acme" / "api" / "price.proto"
+    for path in (money, price):
+        path.parent.mkdir(parents=True)
+    money.write_text('syntax = "proto3";\npackage google.type;\nmessage Money {}\n')
+    price.write_text(
+        'syntax = "proto3";\npackage acme.api;\nimport "google/type/money.proto";\n'
+        "message Price {\n  google.type.Money amount = 1;\n}\n"
+    )
+
+    include_roots, roots = find_include_roots(find_proto_roots([money, price]))
+
+    # money.proto has no imports to guess its root from; it is imported as
+    # google/type/money.proto, so it belongs under third_party/googleapis
+    assert roots[money] == tmp_path / "third_party" / "googleapis"
+    assert tmp_path / "third_party" / "googleapis" in include_roots
+    assert roots[price] in include_roots
+
+
+HEADER = b"""// import "commented/line.proto";
+syntax = "proto3";
+/* import "commented/block.proto";
+   message NotYet {} */
+package acme.api;
+
+import public "acme/public.proto";
+import weak 'acme/weak.proto';
+import /* inline */ "acme/plain.proto"; // trailing
+option java_package = "import";
+
+message Request {}
+import "after/body.proto";
+"""
+
+
+def test_scan_header_skips_comments_and_reads_public_and_weak():
+    imports, done = _scan_header(HEADER, eof=False)
+
+    assert imports == ["acme/public.proto", "acme/weak.proto", "acme/plain.proto"]
+    assert done
+
+
+def test_scan_header_waits_for_more_data():
+    # Cut inside the block comment: nothing it holds may be read as an import
+    cut = HEADER.index(b"message NotYet")
+    assert _scan_header(HEADER[:cut], eof=False) == ([], False)
+    # Cut inside an import path: the partial string is not reported
+    cut = HEADER.index(b"plain.proto")
+    assert _scan_header(HEADER[:cut], eof=False) == (
+        ["acme/public.proto", "acme/weak.proto"], False
+    )
+    # No definition at all: the header runs to the end of the file
+    assert _scan_header(b'import "a.proto";\n', eof=True) == (["a.proto"], True)
@@ -0,0 +1,67 @@
+import os
+
+from proto_explorer.proto_compile_cache import output_names
+from proto_explorer.proto_graph import plan_rebuild, save_state
+
+
+def _write(path, package, *imports):
+    lines = ['syntax = "proto3";', f"package {package};"]
+    lines += [f'import "{imp}";' for imp in imports]
+    path.write_text("\n".join(lines) + "\n")
+
+
+def _compiled_tree(tmp_path):
+    """
+    a <- b <- c (b imports a, c imports b), d <- e, and f on its own,
+    with outputs in place and the state of a full compile saved.
+    """
+    root = tmp_path / "protos"
+    out_dir = tmp_path / "gen"
+    root.mkdir()
+    out_dir.mkdir()
+    _write(root / "a.proto", "a")
+    _write(root / "b.proto", "b", "a.proto")
+    _write(root / "c.proto", "c", "b.proto")
+    _write(root / "d.proto", "d")
+    _write(root / "e.proto", "e", "d.proto")
+    _write(root / "f.proto", "f")
+    roots = {path: root for path in sorted(root.glob("*.proto"))}
+    for path in roots:
+        for rel in output_names(path, root):
+            (out_dir / rel).touch()
+
+    plan = plan_rebuild(out_dir, roots, [])
+    assert sorted(p.name for p in plan.files) == [f"{n}.proto" for n in "abcdef"]
+    save_state(out_dir, plan)
+    assert plan_rebuild(out_dir, roots, []).files == []
+    return root, out_dir, roots
+
+
+def test_plan_rebuild_edited_file(tmp_path):
+    root, out_dir, roots = _compiled_tree(tmp_path)
+    a = root / "a.proto"
+    a.write_text(a.read_text() + "message A {}\n")
+
+    plan = plan_rebuild(out_dir, roots, [])
+
+    assert [p.name for p in plan.files] == ["a.proto", "b.proto", "c.proto"]
+    assert plan.stale == []
+
+
+def test_plan_rebuild_touched_file_is_clean(tmp_path):
+    root, out_dir, roots = _compiled_tree(tmp_path)
+    # A new mtime makes it read again, but its content did not change
+    os.utime(root / "a.proto", ns=(0, 10**18))
+
+    assert plan_rebuild(out_dir, roots, []).files == []
+
+
+def test_plan_rebuild_deleted_file(tmp_path):
+    root, out_dir, roots = _compiled_tree(tmp_path)
+    (root / "d.proto").unlink()
+    del roots[root / "d.proto"]
+
+    plan = plan_rebuild(out_dir, roots, [])
+
+    assert [p.name for p in plan.files] == ["e.proto"]
+    assert sorted(str(p) for p in plan.stale) == ["d_pb2.py", "d_pb2_grpc.py"]
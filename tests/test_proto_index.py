@@ -0,0 +1,25 @@
+import os
+
+from proto_explorer import proto_index
+from proto_explorer.proto_compiler import compile_descriptor_set
+
+
+def _write_set(tmp_path, message):
+    proto = tmp_path / "schema.proto"
+    proto.write_text(f'syntax = "proto3";\npackage demo;\nmessage {message} {{}}\n')
+    data, _ = compile_descriptor_set([proto])
+    path = tmp_path / "schema.pb"
+    path.write_bytes(data)
+    return path
+
+
+def test_index_descriptor_set_replaces_stale_index(tmp_path):
+    path = _write_set(tmp_path, "First")
+    assert proto_index.index_descriptor_set(path).local_messages == ["demo.First"]
+    cached = len(proto_index._SET_INDEXES)
+
+    path = _write_set(tmp_path, "SecondMessage")
+    os.utime(path, ns=(0, 10**9))
+    assert proto_index.index_descriptor_set(path).local_messages == ["demo.SecondMessage"]
+    # The stale index is dropped rather than kept alongside the new one
+    assert len(proto_index._SET_INDEXES) == cached
@@ -0,0 +1,14 @@
+from proto_explorer.proto_loader import parse_args
+
+
+def test_profile_startup_does_not_take_the_proto_path(tmp_path):
+    args = parse_args(["--profile-startup", str(tmp_path)])
+    assert args.proto_paths == [str(tmp_path)]
+    assert args.profile_startup
+    assert args.profile_json is None
+
+
+def test_profile_json_implies_profile_startup(tmp_path):
+    args = parse_args([str(tmp_path), "--profile-json", "profile.json"])
+    assert args.profile_startup
+    assert args.profile_json == "profile.json"
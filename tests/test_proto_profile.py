@@ -0,0 +1,20 @@
+from proto_explorer.proto_profile import parse_importtime
+
+IMPORTTIME = """\
+import time: self [us] | cumulative | imported package
+import time:       100 |        100 |     c
+import time:       200 |        300 |   b
+import time:        50 |         50 |   d
+import time:       400 |        750 | a
+import time:        10 |         10 | e
+"""
+
+
+def test_parse_importtime_builds_tree_from_post_order():
+    roots = parse_importtime(IMPORTTIME)
+
+    assert [node.module for node in roots] == ["a", "e"]
+    a = roots[0]
+    assert (a.self_ms, a.cumulative_ms) == (0.4, 0.75)
+    assert [child.module for child in a.children] == ["b", "d"]
+    assert [child.module for child in a.children[0].children] == ["c"]
@@ -0,0 +1,39 @@
+import re
+
+from proto_explorer.proto_search import build_match_index
+
+
+def _graph(edges, texts=None):
+    texts = texts or {}
+    return {
+        name: ((name, *texts.get(name, ())), tuple(children))
+        for name, children in edges.items()
+    }
+
+
+def test_build_match_index_cycle_matches_as_a_whole():
+    # Root -> A <-> B -> Leaf, and an unrelated cycle C <-> D
+    graph = _graph(
+        {"Root": ["A"], "A": ["B"], "B": ["A", "Leaf"], "Leaf": [], "C": ["D"], "D": ["C"]},
+        texts={"Leaf": ("needle: STRING",)},
+    )
+
+    assert build_match_index(graph, re.compile("needle")) == {"Root", "A", "B", "Leaf"}
+
+
+def test_build_match_index_hit_inside_a_cycle():
+    graph = _graph(
+        {"Root": ["A"], "A": ["B"], "B": ["C"], "C": ["A"], "Other": []},
+        texts={"C": ("needle: STRING",)},
+    )
+
+    assert build_match_index(graph, re.compile("needle")) == {"Root", "A", "B", "C"}
+
+
+def test_build_match_index_self_reference_and_unknown_children():
+    # Node is recursive and points at a message missing from the graph
+    graph = _graph({"Node": ["Node", "Missing"], "Root": ["Node"]})
+
+    assert build_match_index(graph, re.compile("^Node$")) == {"Node", "Root"}
+    assert build_match_index(graph, re.compile("Missing")) == frozenset()
+    assert build_match_index(graph, None) == frozenset()
@@ -0,0 +1,51 @@
+import json
+import socket
+import threading
+
+import pytest
+
+from proto_explorer.proto_server import CompileServer, _Handler
+
+
+@pytest.fixture
+def server_path(tmp_path):
+    path = str(tmp_path / "server.sock")
+    server = CompileServer(path, _Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield path
+    server.shutdown()
+    server.server_close()
+
+
+def _connect(path):
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.settimeout(5)
+    client.connect(path)
+    return client, client.makefile("rwb")
+
+
+def _request(stream, request):
+    stream.write(json.dumps(request).encode() + b"\n")
+    stream.flush()
+    return json.loads(stream.readline())
+
+
+def test_open_connection_does_not_block_other_clients(server_path):
+    first, first_stream = _connect(server_path)
+    assert _request(first_stream, {"op": "ping", "id": 1})["id"] == 1
+
+    # The first connection stays open
+    second, second_stream = _connect(server_path)
+    assert _request(second_stream, {"op": "ping", "id": 2})["ok"]
+    first.close()
+    second.close()
+
+
+def test_compile_needs_out_dir(server_path, tmp_path):
+    (tmp_path / "a.proto").write_text('syntax = "proto3";\nmessage A {}\n')
+    client, stream = _connect(server_path)
+    response = _request(stream, {"op": "compile", "path": str(tmp_path / "a.proto")})
+    assert not response["ok"]
+    assert "out_dir" in response["error"]
+    client.close()
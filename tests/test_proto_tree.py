@@ -0,0 +1,68 @@
+from proto_explorer.proto_schema import FieldRow
+from proto_explorer.proto_tree import TreeTable
+
+
+def _field(name, number, child=None):
+    type_name = child or "STRING"
+    return FieldRow(name, number, "optional", type_name, False, False, None, child)
+
+
+# A.b -> B, A.c -> C, B.c -> C, C.a -> A (a cycle back to the top)
+ROWS = {
+    "A": (_field("x", 1), _field("b", 2, "B"), _field("y", 3), _field("c", 4, "C")),
+    "B": (_field("p", 1), _field("c", 2, "C"), _field("q", 3)),
+    "C": (_field("s", 1), _field("a", 2, "A")),
+    "D": (_field("z", 1),),
+}
+ROOTS = ["A", "D", "C"]
+
+
+def _flatten(expanded):
+    """Every visible path, walked the slow way."""
+    out = []
+
+    def walk(path, message):
+        for row in ROWS[message]:
+            child = path + (row.name,)
+            out.append(child)
+            if row.child and child in expanded:
+                walk(child, row.child)
+
+    for root in ROOTS:
+        out.append((root,))
+        if (root,) in expanded:
+            walk((root,), root)
+    return out
+
+
+def test_window_offsets_with_open_nodes():
+    expanded = {
+        ("A",),
+        ("A", "b"),
+        ("A", "b", "c"),
+        ("A", "b", "c", "a"),
+        ("A", "c"),
+        ("C",),
+        # Ignored: parent closed, and a field that is not a message
+        ("D", "z"),
+        ("A", "x"),
+    }
+    table = TreeTable(ROOTS, ROWS, expanded)
+    expected = _flatten(expanded)
+
+    assert len(table) == len(expected)
+    for start in range(len(expected) + 1):
+        for count in (1, 3, len(expected)):
+            window = table.window(start, count)
+            assert [row.path for row in window] == expected[start:start + count]
+            assert [row.depth for row in window] == [len(p) - 1 for p in expected[start:start + count]]
+
+
+def test_window_marks_open_and_expandable_rows():
+    table = TreeTable(ROOTS, ROWS, {("A",), ("A", "b")})
+    rows = {row.path: row for row in table.window(0, len(table))}
+
+    assert rows[("A",)].expanded and rows[("A", "b")].expanded
+    assert rows[("A", "c")].expandable and not rows[("A", "c")].expanded
+    assert not rows[("A", "x")].expandable
+    assert rows[("A", "b", "p")].depth == 2